@@ -8,7 +8,7 @@ import { Tabs, TabsContent, TabsList, TabsTrigger } from "@/components/ui/tabs"
 import { Badge } from "@/components/ui/badge"
 import Link from "next/link"
 import { useSearchParams } from "next/navigation"
-import { fetchSearchItems } from '@/lib/api';
+import { fetchConsumer, fetchStats, type Stats } from '@/lib/api';
 
 // Sample data - in real app this would come from API
 export interface SearchItem {
@@ -33,33 +33,23 @@ const monthNames = ["Янв", "Фев", "Мар", "Апр", "Май", "Июн",
 
 export default function DashboardPage() {
   const [searchQuery, setSearchQuery] = useState("")
-  const [searchItems, setSearchItems] = useState<SearchItem[]>([]);
-  const [loading, setLoading] = useState(true);
   const [activeTab, setActiveTab] = useState("overview")
   const [accountData, setAccountData] = useState<SearchItem | null>(null);
+  const [stats, setStats] = useState<Stats | null>(null);
   const searchParams = useSearchParams()
+
+  // Сводка по всем потребителям — для сравнения; без неё страница работает как раньше
   useEffect(() => {
-    const loadData = async () => {
-      try {
-        const accountsData = await fetchSearchItems(1, 200);
-        setSearchItems(accountsData);
-      } finally {
-        setLoading(false);
-      }
-    };
-    loadData();
+    fetchStats().then(setStats).catch(() => setStats(null));
   }, []);
 
-
 useEffect(() => {
   const accountId = searchParams.get("accountId");
-  if (accountId && searchItems.length > 0) {
-    const foundItem = searchItems.find(item => item.id.toString() === accountId);
-    if (foundItem) {
-      setAccountData(foundItem); // Сохраняем весь объект
-    }
+  if (accountId) {
+    // Один счёт с /dashboard/{id} вместо первых 200 с /consumers/
+    fetchConsumer(Number(accountId)).then(setAccountData).catch(() => setAccountData(null));
   }
-}, [searchParams, searchItems]);
+}, [searchParams]);
 
   if (!accountData) {
     return <div>Загрузка...</div>
@@ -104,6 +94,13 @@ useEffect(() => {
   ]
 
   const maxSeasonal = Math.max(...seasonalData.map((d) => d.value))
+
+  // Среднее по всем потребителям того же типа здания
+  const peerGroup = stats?.by_building_type.find((group) => group.key === accountData.data.buildingType)
+  const peerMonthly = peerGroup?.monthly.filter((value): value is number => value !== null) ?? []
+  const peerAvgConsumption = peerMonthly.length
+    ? Math.round(peerMonthly.reduce((sum, value) => sum + value, 0) / peerMonthly.length)
+    : null
   return (
     <div className="min-h-screen bg-gradient-to-br from-gray-50 to-gray-100">
       {/* Decorative background elements */}
@@ -404,6 +401,24 @@ useEffect(() => {
                       {Math.round(((winterConsumption - summerConsumption) / summerConsumption) * 100)}%
                     </span>
                   </li>
+                  {peerGroup && peerAvgConsumption !== null && (
+                    <li className="flex items-start gap-2">
+                      <div className="w-2 h-2 bg-green-500 rounded-full mt-2"></div>
+                      <span>
+                        Среднее потребление по типу «{accountData.data.buildingType}» ({peerGroup.count} счетов):{" "}
+                        {peerAvgConsumption} кВт·ч в месяц, у этого счёта — {avgConsumption} кВт·ч
+                      </span>
+                    </li>
+                  )}
+                  {stats && stats.total.count > 0 && (
+                    <li className="flex items-start gap-2">
+                      <div className="w-2 h-2 bg-green-500 rounded-full mt-2"></div>
+                      <span>
+                        Доля коммерческих среди всех {stats.total.count} счетов —{" "}
+                        {Math.round(stats.total.commercial_share * 100)}%
+                      </span>
+                    </li>
+                  )}
                 </ul>
               </CardContent>
             </Card>
@@ -6,7 +6,7 @@ import { Input } from "@/components/ui/input"
 import { Avatar, AvatarFallback } from "@/components/ui/avatar"
 import { Button } from "@/components/ui/button"
 import { Card } from "@/components/ui/card"
-import { fetchSearchItems } from '@/lib/api';
+import { searchConsumers, SearchHit } from '@/lib/api';
 import Link from "next/link"
 
 export interface SearchItem {
@@ -30,24 +30,24 @@ export interface SearchItem {
 export default function HomePage() {
   const [searchQuery, setSearchQuery] = useState("")
   const [isSearchActive, setIsSearchActive] = useState(false)
-  const [searchItems, setSearchItems] = useState<SearchItem[]>([]);
+  const [filteredItems, setFilteredItems] = useState<SearchHit[]>([]);
   const [loading, setLoading] = useState(true);
   useEffect(() => {
-    const loadData = async () => {
+    // Поиск на сервере с небольшой задержкой, чтобы не слать запрос на каждую букву
+    let cancelled = false;
+    const timer = setTimeout(async () => {
       try {
-        const data = await fetchSearchItems(1, 200);
-        setSearchItems(data);
+        const data = await searchConsumers(searchQuery, 20);
+        if (!cancelled) setFilteredItems(data);
       } finally {
-        setLoading(false);
+        if (!cancelled) setLoading(false);
       }
+    }, 150);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
     };
-    loadData();
-  }, []);
-  const filteredItems = searchItems.filter(
-    (item) =>
-      item.title.toLowerCase().includes(searchQuery.toLowerCase()) ||
-      item.description.toLowerCase().includes(searchQuery.toLowerCase()),
-  )
+  }, [searchQuery]);
 
   return (
     <div className="min-h-screen bg-gradient-to-br from-gray-50 to-gray-100">
@@ -28,4 +28,70 @@ export const fetchConsumer = async (accountId: number) => {
     throw new Error('Failed to fetch consumer');
   }
   return response.json();
-};
\ No newline at end of file
+};
+
+export interface SearchPage {
+  items: SearchItem[];
+  next: string | null;
+}
+
+// Keyset-пагинация: передайте next из предыдущей страницы как after
+export const fetchSearchPage = async (after: string | null = null, perPage: number = 200): Promise<SearchPage> => {
+  const params = new URLSearchParams({ per_page: String(perPage) });
+  if (after) params.set('after', after);
+  const response = await fetch(`http://localhost:8000/consumers/?${params}`);
+  if (!response.ok) throw new Error('Failed to fetch search items');
+  return { items: await response.json(), next: response.headers.get('X-Next-Cursor') };
+};
+
+export interface SearchHit {
+  id: number;
+  title: string;
+  description: string;
+  avatar: string;
+  prob: number;
+}
+
+export interface SearchFilters {
+  isCommercial?: boolean;
+  buildingType?: string;
+  minProb?: number;
+  maxProb?: number;
+}
+
+// Серверный поиск по адресу: ищет по всем потребителям, а не по загруженной странице
+export const searchConsumers = async (query: string, limit: number = 20, filters: SearchFilters = {}): Promise<SearchHit[]> => {
+  const params = new URLSearchParams({ q: query, limit: String(limit) });
+  if (filters.isCommercial !== undefined) params.set('is_commercial', String(filters.isCommercial));
+  if (filters.buildingType) params.set('building_type', filters.buildingType);
+  if (filters.minProb !== undefined) params.set('min_prob', String(filters.minProb));
+  if (filters.maxProb !== undefined) params.set('max_prob', String(filters.maxProb));
+  const response = await fetch(`http://localhost:8000/consumers/search?${params}`);
+  if (!response.ok) throw new Error('Failed to search consumers');
+  return response.json();
+};
+
+export interface StatsGroup {
+  key: string | null;
+  count: number;
+  commercial: number;
+  commercial_share: number;
+  avg_prob: number;
+  avg_area: number | null;
+  monthly: (number | null)[];
+}
+
+export interface Stats {
+  total: Omit<StatsGroup, 'key'>;
+  by_region: StatsGroup[];
+  by_district: StatsGroup[];
+  by_building_type: StatsGroup[];
+  probability_histogram: { from: number; to: number; count: number; commercial: number }[];
+}
+
+// Сводная статистика по всем потребителям (агрегаты считаются при загрузке данных)
+export const fetchStats = async (): Promise<Stats> => {
+  const response = await fetch('http://localhost:8000/stats');
+  if (!response.ok) throw new Error('Failed to fetch stats');
+  return response.json();
+};
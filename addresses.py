@@ -0,0 +1,168 @@
+# === Разбор адресов и поля для отображения ===
+# Адреса вида "Краснодарский край, р-н Мостовский, пгт Мостовской, ул Колхозная, д. 37 1":
+# регион — первая часть, район — часть "р-н ...", дом — всё начиная с "д. ...",
+# улица — последняя из оставшихся частей, населённый пункт — остальное.
+# building_key() сводит варианты написания одного здания к одному ключу.
+
+DISTRICT_PREFIXES = ("р-н", "р-он")
+HOUSE_PREFIXES = ("д.",)
+STREET_PREFIXES = (
+    "ул", "ул.", "пер", "пер.", "пр-кт", "проезд", "пр-д", "мкр", "мкр.", "кв-л", "квартал",
+    "линия", "туп", "б-р", "ш", "пл", "наб", "участок", "Участок", "уч-к", "секция",
+)
+ADDRESS_COMPONENTS = ("region", "district", "settlement", "street", "house")
+
+# Варианты написания типов → каноническая форма (ключи в нижнем регистре)
+SETTLEMENT_TYPES = {
+    "г": "г", "г.": "г", "город": "г",
+    "пгт": "пгт", "пгт.": "пгт", "рп": "пгт",
+    "ст-ца": "ст-ца", "ст.": "ст-ца", "станица": "ст-ца",
+    "с": "с", "с.": "с", "село": "с",
+    "п": "п", "п.": "п", "пос": "п", "пос.": "п", "поселок": "п",
+    "х": "х", "х.": "х", "хутор": "х",
+    "аул": "аул",
+    "снт": "снт", "с/т": "снт",
+    "тер": "тер", "тер.": "тер",
+    "мкр": "мкр", "мкр.": "мкр", "микрорайон": "мкр",
+}
+STREET_TYPES = {
+    "ул": "ул", "ул.": "ул", "улица": "ул",
+    "пер": "пер", "пер.": "пер", "переулок": "пер",
+    "пр-кт": "пр-кт", "проспект": "пр-кт",
+    "проезд": "проезд", "пр-д": "проезд",
+    "кв-л": "кв-л", "квартал": "кв-л",
+    "б-р": "б-р", "бульвар": "б-р",
+    "ш": "ш", "шоссе": "ш",
+    "туп": "туп", "линия": "линия", "пл": "пл", "наб": "наб",
+    "мкр": "мкр", "мкр.": "мкр",
+}
+
+
+def normalize_address(address):
+    # Ключ для сравнения адресов: регистр, ё/е, лишние пробелы и пробелы у запятых не важны
+    parts = (" ".join(part.split()) for part in address.lower().replace("ё", "е").split(","))
+    return ", ".join(part for part in parts if part)
+
+
+def _has_prefix(part, prefixes):
+    head = part.split(" ", 1)[0]
+    return head in prefixes or any(head.startswith(p) and p.endswith(".") for p in prefixes)
+
+
+def parse_address(address):
+    components = dict.fromkeys(ADDRESS_COMPONENTS)
+    if not address:
+        return components
+    parts = [part.strip() for part in address.split(", ")]
+    components["region"] = parts[0]
+
+    rest = parts[1:]
+    for i, part in enumerate(rest):
+        if _has_prefix(part, HOUSE_PREFIXES):
+            components["house"] = ", ".join(rest[i:])
+            rest = rest[:i]
+            break
+
+    middle = []
+    for part in rest:
+        if components["district"] is None and _has_prefix(part, DISTRICT_PREFIXES):
+            components["district"] = part
+        else:
+            middle.append(part)
+    if middle and (len(middle) > 1 or _has_prefix(middle[-1], STREET_PREFIXES)):
+        components["street"] = middle.pop()
+    if middle:
+        components["settlement"] = ", ".join(middle)
+    return components
+
+
+def _normalize_name(text):
+    return " ".join(text.lower().replace("ё", "е").replace('"', " ").split())
+
+
+def _split_type(part, types):
+    # "ул Колхозная" → ("ул", "колхозная"); тип бывает слитно с названием: "ул.Трудовая"
+    part = _normalize_name(part)
+    head, _, rest = part.partition(" ")
+    if head in types:
+        return types[head], rest
+    kind, dot, name = head.partition(".")
+    if dot and name and kind + "." in types:
+        return types[kind + "."], (name + " " + rest).strip()
+    return None, part
+
+
+def address_components(address):
+    # Нормализованные части адреса: тип и название отдельно, дом — номер и суффикс
+    # (корпус, литера), квартира — unit. Порядок частей и написание типов не важны
+    parsed = parse_address(address)
+    components = dict.fromkeys(("region", "district", "settlement_type", "settlement",
+                                "street_type", "street", "house", "suffix", "unit"))
+    if parsed["region"] is not None:
+        components["region"] = _normalize_name(parsed["region"])
+    if parsed["district"] is not None:
+        components["district"] = _normalize_name(parsed["district"]).split(" ", 1)[-1]
+    if parsed["settlement"] is not None:
+        # "г Сочи, пос Лоо" — берётся самый мелкий населённый пункт
+        last = parsed["settlement"].split(", ")[-1]
+        components["settlement_type"], components["settlement"] = _split_type(last, SETTLEMENT_TYPES)
+    if parsed["street"] is not None:
+        components["street_type"], components["street"] = _split_type(parsed["street"], STREET_TYPES)
+    if parsed["house"] is not None:
+        house, _, unit = parsed["house"].partition(", ")
+        tokens = _normalize_name(house).split()[1:]  # без "д."
+        if tokens:
+            components["house"] = tokens[0]
+            components["suffix"] = " ".join(tokens[1:]) or None
+        components["unit"] = _normalize_name(unit) or None
+    return components
+
+
+def building_key(address):
+    # Ключ здания: квартира не учитывается; район не учитывается для городов,
+    # где он пишется то до, то после города, а то и не пишется вовсе
+    c = address_components(address)
+    district = None if c["settlement_type"] == "г" else c["district"]
+    settlement = " ".join(filter(None, (c["settlement_type"], c["settlement"])))
+    street = " ".join(filter(None, (c["street_type"], c["street"])))
+    house = " ".join(filter(None, (c["house"], c["suffix"])))
+    return "|".join(part or "" for part in (c["region"], district, settlement, street, house))
+
+
+def building_keys(addresses):
+    # Ключи для списка адресов; одинаковые строки разбираются один раз
+    memo = {}
+    keys = []
+    for address in addresses:
+        key = memo.get(address)
+        if key is None:
+            key = memo[address] = building_key(address) if address else ""
+        keys.append(key)
+    return keys
+
+
+def building_index(account_ids, addresses):
+    # Ключ здания → accountId всех счетов по этому адресу
+    index = {}
+    for account_id, key in zip(account_ids, building_keys(addresses)):
+        index.setdefault(key, []).append(account_id)
+    return index
+
+
+def display_fields(address, building_type, rooms_count, total_area):
+    # title — первые три части адреса, description — последняя часть и данные объекта,
+    # avatar — первая буква адреса
+    address_parts = address.split(', ')
+    title = ', '.join(address_parts[:3]) if len(address_parts) >= 3 else address
+    last_address_part = address_parts[-1] if address_parts else ''
+    description = f"{last_address_part} • {building_type} • {rooms_count} комнаты • {total_area or 0} м²"
+    avatar = address[0] if address else '?'
+    return title, description, avatar
+
+
+def derived_fields(address, building_type, rooms_count, total_area):
+    # Всё, что хранится в ElectricityConsumer рядом с адресом
+    title, description, avatar = display_fields(address, building_type, rooms_count, total_area)
+    fields = {"title": title, "description": description, "avatar": avatar}
+    fields.update(parse_address(address))
+    return fields
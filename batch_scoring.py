@@ -0,0 +1,98 @@
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from columnar import is_columnar, open_columnar
+from ensemble import process_context, set_predict_threads
+from jsonstream import JsonWriter, iter_batches
+from metrics import stage
+from registry import REGISTRY_DIR, latest_version, load_artifact
+
+# === Пакетный скоринг шардами в пуле процессов ===
+# Вход делится на шарды по SHARD_SIZE записей; каждый процесс пула один раз загружает
+# модель и для шарда считает признаки, предсказания трёх моделей и сразу кодирует
+# записи в текст выходного файла. Родитель только пишет готовый текст по порядку
+# шардов: результат совпадает с последовательным Startscr.py. В работе одновременно
+# не больше 2×workers шардов, поэтому память не зависит от размера входа.
+# Колоночный вход процессы читают сами через memmap (родителю передаются только
+# границы шарда); JSON разбирает родитель.
+#
+#   python batch_scoring.py dataset_control.json dataset_control_predicted.jsonl [workers] [модель]
+
+SHARD_SIZE = 10_000
+WORKERS = int(os.environ.get("ELECTRICITY_SCORE_WORKERS", os.cpu_count() or 1))
+
+_artifact = None
+
+
+def _init_worker(name, version, root, threads):
+    global _artifact
+    _artifact = load_artifact(name, version, root)
+    if _artifact.models is not None:
+        set_predict_threads(_artifact.models, threads)
+
+
+def _score_shard(shard, encoder):
+    # shard — список записей или (путь колоночного набора, начало, конец)
+    if isinstance(shard, tuple):
+        path, start, stop = shard
+        batch = open_columnar(path)[start:stop]
+    else:
+        batch = shard
+    labels = _artifact.predict(batch)
+    texts = []
+    for record, label in zip(batch, labels.tolist()):
+        record["isCommercial"] = bool(label)
+        texts.append(encoder.encode(record))
+    return texts
+
+
+def iter_shards(path, shard_size=SHARD_SIZE):
+    if is_columnar(path):
+        count = open_columnar(path).meta["count"]
+        for start in range(0, count, shard_size):
+            yield path, start, min(start + shard_size, count)
+    else:
+        yield from iter_batches(path, shard_size)
+
+
+def score_sharded(input_path, output_path, name="base", version=None, workers=WORKERS,
+                  shard_size=SHARD_SIZE, indent=None, root=REGISTRY_DIR, threads=1, verbose=True):
+    # *.jsonl — JSON Lines, иначе JSON-массив (indent=2 — раскладка Startscr.py)
+    # Версия фиксируется до запуска пула: все процессы считают одной моделью
+    if version is None:
+        version = latest_version(name, root)
+    started = time.perf_counter()
+    # Процессы — через ensemble.process_context(), как и у ансамбля: родитель
+    # мог уже считать моделями, и fork унаследовал бы его потоки OpenMP
+    with JsonWriter(output_path, indent=indent) as writer, \
+            ProcessPoolExecutor(workers, mp_context=process_context(), initializer=_init_worker,
+                                initargs=(name, version, os.path.abspath(root), threads)) as pool:
+        encoder = JsonWriter(output_path, indent=indent)
+        pending = deque()
+
+        def drain():
+            texts = pending.popleft().result()
+            with stage("write-back"):
+                for text in texts:
+                    writer.write_encoded(text)
+            if verbose:
+                elapsed = time.perf_counter() - started
+                print(f"Обработано {writer.count} записей ({writer.count / elapsed:.0f} строк/с)")
+
+        for shard in iter_shards(input_path, shard_size):
+            pending.append(pool.submit(_score_shard, shard, encoder))
+            if len(pending) >= 2 * workers:
+                drain()
+        while pending:
+            drain()
+    return writer.count
+
+
+if __name__ == "__main__":
+    source, target = sys.argv[1], sys.argv[2]
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else WORKERS
+    model = sys.argv[4] if len(sys.argv) > 4 else "base"
+    count = score_sharded(source, target, model, workers=workers, indent=None if target.endswith(".jsonl") else 2)
+    print(f"✅ {count} записей → {target}")
@@ -0,0 +1,952 @@
+import asyncio
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from features import extract_features
+from jsonstream import JsonWriter
+
+# === Бенчмарки: python bench.py [имя ...] ===
+
+BUILDING_TYPES = ["Частный", "Прочий", "Многоквартирный", "Гараж", "Дача"]
+
+
+def make_consumers(n, seed=0):
+    rng = np.random.default_rng(seed)
+    months = rng.integers(0, 6000, size=(n, 12))
+    present = rng.random((n, 12)) > 0.05
+    area = rng.uniform(20, 300, size=n)
+    has_area = rng.random(n) > 0.4
+    types = rng.integers(0, len(BUILDING_TYPES), size=n)
+    data = []
+    for i in range(n):
+        entry = {
+            "accountId": i + 1,
+            "isCommercial": bool(i % 4 == 0),
+            "address": f"Краснодарский край, г Краснодар, ул Ленина, д. {i % 300 + 1}",
+            "buildingType": BUILDING_TYPES[types[i]],
+            "roomsCount": int(i % 6 + 1),
+            "residentsCount": int(i % 5 + 1),
+            "consumption": {str(m + 1): int(months[i, m]) for m in range(12) if present[i, m]},
+        }
+        if has_area[i]:
+            entry["totalArea"] = round(float(area[i]), 1)
+        data.append(entry)
+    return data
+
+
+def legacy_flatten_dataset(data):
+    # Прежний построчный вариант из Startscr.py — эталон для сравнения
+    records = []
+    for entry in data:
+        flat = {
+            "roomsCount": entry.get("roomsCount", 0),
+            "residentsCount": entry.get("residentsCount", 0),
+            "totalArea": entry.get("totalArea", np.nan),
+            "buildingType": entry.get("buildingType", "NA"),
+        }
+
+        consumption = entry.get("consumption", {})
+        month_values = {m: consumption.get(str(m), 0) for m in range(1, 13)}
+        summer = [month_values[m] for m in [5, 6, 7, 8, 9]]
+        winter = [month_values[m] for m in [10, 11, 12, 1, 2, 3, 4]]
+        all_vals = list(month_values.values())
+
+        flat["summer_mean"] = np.mean(summer)
+        flat["winter_mean_consumption"] = np.mean(winter)
+        flat["std_summer"] = np.std(summer)
+        flat["std_winter"] = np.std(winter)
+        flat["zero_month_ratio"] = sum(1 for v in all_vals if v == 0) / 12
+        flat["area_per_person"] = flat["totalArea"] / (flat["residentsCount"] + 0.1) if pd.notnull(flat["totalArea"]) else np.nan
+        flat["population_density"] = (flat["residentsCount"] + 0.1) / (flat["totalArea"] + 0.1)
+
+        for m in [1, 2, 3, 4, 10, 11, 12]:
+            flat[f"c_{m}"] = month_values[m]
+
+        records.append(flat)
+    df = pd.DataFrame(records)
+    df["buildingType"], _ = pd.factorize(df["buildingType"])
+    return df
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def bench_features(sizes=(10_000, 100_000, 1_000_000)):
+    print("=== flatten_dataset: построчно vs features.extract_features ===")
+    for n in sizes:
+        data = make_consumers(n)
+        legacy, t_legacy = timed(legacy_flatten_dataset, data)
+        (X, columns), t_new = timed(extract_features, data)
+        assert list(legacy.columns) == columns
+        assert np.allclose(legacy.to_numpy(dtype=np.float64), X, rtol=1e-6, equal_nan=True)
+        print(f"{n:>9} строк: {t_legacy:8.2f} с → {t_new:6.2f} с (x{t_legacy / t_new:.1f})")
+
+
+def make_predictions(n, seed=0):
+    data = make_consumers(n, seed)
+    rng = np.random.default_rng(seed)
+    for entry, prob in zip(data, rng.random(n)):
+        entry["probability_isCommercial"] = float(prob)
+        entry["isCommercial"] = bool(prob > 0.5)
+    return data
+
+
+def write_json(data, directory, name):
+    path = os.path.join(directory, name)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    return path
+
+
+async def _ingest(path, db_url, loader, *args):
+    from tortoise import Tortoise
+    import convert
+    await convert.init_db(db_url)
+    try:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            await getattr(convert, loader)(path, *args)
+        return time.perf_counter() - start
+    finally:
+        await Tortoise.close_connections()
+
+
+def bench_ingest(sizes=(1_000, 10_000), chunk_size=1000):
+    print("=== convert.py: insert_consumers vs insert_consumers_bulk (SQLite) ===")
+    with tempfile.TemporaryDirectory() as directory:
+        for n in sizes:
+            path = write_json(make_predictions(n), directory, f"predictions_{n}.json")
+            t_bulk = asyncio.run(_ingest(path, f"sqlite://{directory}/bulk_{n}.db", "insert_consumers_bulk", chunk_size))
+            if n <= 10_000:
+                t_rows = asyncio.run(_ingest(path, f"sqlite://{directory}/rows_{n}.db", "insert_consumers"))
+                print(f"{n:>9} потребителей: {t_rows:8.2f} с → {t_bulk:6.2f} с (x{t_rows / t_bulk:.1f})")
+            else:
+                print(f"{n:>9} потребителей: bulk {t_bulk:6.2f} с ({n / t_bulk:.0f} строк/с)")
+
+
+_PEAK_RSS = """
+import resource, sys, time
+start = time.perf_counter()
+{body}
+# ru_maxrss на Linux переживает fork/exec и может оказаться пиком родителя;
+# VmHWM — пик самого процесса
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+try:
+    with open("/proc/self/status") as status:
+        peak = next(int(line.split()[1]) for line in status if line.startswith("VmHWM:"))
+except OSError:
+    pass
+print(time.perf_counter() - start, peak)
+"""
+
+_JSON_LOAD = """
+import json
+from features import extract_features
+with open(sys.argv[1], encoding="utf-8") as f:
+    data = json.load(f)
+X, columns = extract_features(data)
+"""
+
+_STREAMING = """
+from features import load_features
+X, columns = load_features(sys.argv[1])
+"""
+
+_COLD_SCORE = """
+import os
+from columnar import iter_dataset
+from registry import load_artifact
+artifact = load_artifact("bench", root=os.path.join(sys.argv[1], "models"), compiled={compiled})
+proba = artifact.score(next(iter_dataset(os.path.join(sys.argv[1], "control.json"), 1000)))
+"""
+
+
+def write_synthetic_file(path, target_bytes, batch_size=50_000):
+    seed = 0
+    with JsonWriter(path, indent=2) as writer:
+        while os.path.getsize(path) < target_bytes:
+            batch = make_consumers(batch_size, seed)
+            for entry in batch:
+                entry["accountId"] += seed * batch_size
+            writer.write_many(batch)
+            seed += 1
+    return writer.count
+
+
+def _peak_rss(body, path):
+    script = _PEAK_RSS.format(body=body)
+    out = subprocess.run([sys.executable, "-c", script, path], capture_output=True, text=True, check=True,
+                         cwd=os.path.dirname(os.path.abspath(__file__)))
+    seconds, rss_kb = out.stdout.split()
+    return float(seconds), int(rss_kb) / 1024
+
+
+def bench_stream(sizes_gb=(0.1, 2.0), baseline_limit_gb=0.5):
+    print("=== Пиковая память: json.load + extract_features vs потоковый load_features ===")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes_gb:
+            path = os.path.join(directory, f"synthetic_{size}.json")
+            n = write_synthetic_file(path, int(size * 1024 ** 3))
+            t_stream, rss_stream = _peak_rss(_STREAMING, path)
+            line = f"{size:5.2f} ГБ ({n} записей): поток {t_stream:7.1f} с, {rss_stream:7.0f} МБ"
+            if size <= baseline_limit_gb:
+                t_load, rss_load = _peak_rss(_JSON_LOAD, path)
+                line += f"; json.load {t_load:7.1f} с, {rss_load:7.0f} МБ"
+            print(line)
+            os.remove(path)
+
+
+def bench_columnar(sizes=(100_000, 1_000_000)):
+    from columnar import json_to_columnar, open_columnar
+    print("=== Чтение + признаки: JSON vs колоночный формат ===")
+    with tempfile.TemporaryDirectory() as directory:
+        for n in sizes:
+            path = write_json(make_consumers(n), directory, f"consumers_{n}.json")
+            cols = os.path.join(directory, f"consumers_{n}.cols")
+            json_to_columnar(path, cols)
+
+            def from_json():
+                with open(path, encoding="utf-8") as f:
+                    return extract_features(json.load(f))
+
+            _, t_json = timed(from_json)
+            _, t_cols = timed(lambda: extract_features(open_columnar(cols)))
+            size_json = os.path.getsize(path) / 1024 ** 2
+            size_cols = sum(os.path.getsize(os.path.join(cols, f)) for f in os.listdir(cols)) / 1024 ** 2
+            print(f"{n:>9} строк: JSON {t_json:6.2f} с / {size_json:6.0f} МБ → "
+                  f"колонки {t_cols:6.3f} с / {size_cols:6.0f} МБ")
+
+
+def bench_feature_cache(sizes=(100_000, 1_000_000)):
+    from feature_cache import cached_features
+    print("=== Признаки набора: разбор JSON vs feature_cache (промах / попадание) ===")
+    with tempfile.TemporaryDirectory() as directory:
+        cache_dir = os.path.join(directory, "cache")
+        for n in sizes:
+            path = write_json(make_consumers(n), directory, f"consumers_{n}.json")
+            _, t_json = timed(lambda: cached_features(path, True, cache_dir=""))
+            _, t_miss = timed(lambda: cached_features(path, True, cache_dir=cache_dir))
+            features, t_hit = timed(lambda: cached_features(path, True, cache_dir=cache_dir))
+            _, t_use = timed(lambda: float(np.asarray(features.X).sum()))
+            print(f"{n:>9} строк: без кэша {t_json:6.2f} с, промах {t_miss:6.2f} с, "
+                  f"попадание {t_hit * 1000:6.2f} мс (+ чтение матрицы {t_use * 1000:6.1f} мс)")
+
+
+def bench_buildings(sizes=(10_000, 100_000), n_train=5_000):
+    import pandas as pd
+    from addresses import building_index, building_keys
+    from features import (BUILDING_COLUMNS, building_features, building_stats, consumption_matrix,
+                          extract_account_ids)
+    from registry import load_artifact, train_artifact
+    from synthetic import make_realistic_consumers
+    print("=== Признаки зданий: building_stats vs pandas groupby ===")
+    for n in sizes:
+        data = make_realistic_consumers(n, buildings=n // 4)
+        addresses = [record.get("address") for record in data]
+        stats, t_stats = timed(building_stats, data)
+        frame = pd.DataFrame({"key": building_keys(addresses), "accountId": extract_account_ids(data),
+                              "yearly": consumption_matrix(data).sum(axis=1)})
+        grouped, t_pandas = timed(lambda: frame.groupby("key")["yearly"].agg(["size", "sum"]))
+        assert set(stats) == set(grouped.index)
+        assert all(stats[key][0] == count and np.isclose(stats[key][1], total)
+                   for key, count, total in zip(grouped.index, grouped["size"], grouped["sum"]))
+        index, t_index = timed(building_index, frame["accountId"].tolist(), addresses)
+        assert index == frame.groupby("key", sort=False)["accountId"].agg(list).to_dict()
+        _, t_features = timed(building_features, data, stats)
+        print(f"{n:>9} строк, {len(stats)} зданий: статистика {t_stats:5.2f} с (с разбором адресов; "
+              f"groupby по готовым ключам {t_pandas:5.3f} с), индекс {t_index:5.2f} с, признаки {t_features:5.2f} с")
+
+    # Версия с признаками зданий: скоринг считает их по той же статистике, что и обучение
+    with tempfile.TemporaryDirectory() as directory:
+        data = make_realistic_consumers(n_train, seed=1, buildings=n_train // 4)
+        path = write_json(data, directory, "train.json")
+        root = os.path.join(directory, "models")
+        artifact = train_artifact("bench", path, root=root, reuse=False, buildings=True)
+        reloaded = load_artifact("bench", root=root, compiled=False)
+        assert reloaded.feature_columns[-len(BUILDING_COLUMNS):] == BUILDING_COLUMNS
+        expected = artifact.imputer.transform(np.asarray(artifact.features(path).X))
+        assert np.array_equal(reloaded.transform(data), expected)
+        print(f"{n_train} строк: признаки зданий при обучении и скоринге совпадают")
+
+
+def bench_ensemble(n=100_000):
+    from ensemble import ensemble_proba, fit_models, threads_per_member
+    from features import extract_targets
+    from sklearn.impute import SimpleImputer
+    print(f"=== Ансамбль: последовательно vs процессы ({n} строк) ===")
+    data = make_consumers(n)
+    X, _ = extract_features(data)
+    X = SimpleImputer(strategy="median").fit_transform(X)
+    y = extract_targets(data)
+    threads = threads_per_member()
+    for parallel in (False, True):
+        models, t_fit = timed(fit_models, X, y, parallel=parallel, n_threads=threads)
+        proba, t_predict = timed(ensemble_proba, models, X, parallel=parallel, verbose=True)
+        if not parallel:
+            reference = proba
+        print(f"{'процессы' if parallel else 'подряд':>9}: обучение {t_fit:6.2f} с, предсказание {t_predict:6.2f} с")
+    assert np.array_equal(reference, proba)
+
+
+def bench_compiled(n=100_000, n_train=20_000, repeat=3):
+    # Холодный старт (импорт, загрузка модели, первый батч из 1000 строк) и пиковая
+    # память — в отдельном процессе; скорость — на готовой матрице признаков
+    from columnar import iter_dataset
+    from ensemble import ensemble_proba
+    from registry import load_artifact, train_artifact
+    from synthetic import write_realistic
+    print("=== Скоринг: библиотеки бустинга vs compiled_trees.py ===")
+    with tempfile.TemporaryDirectory() as directory:
+        root = os.path.join(directory, "models")
+        train = os.path.join(directory, "train.json")
+        write_realistic(train, n_train, seed=1)
+        with contextlib.redirect_stdout(io.StringIO()):
+            train_artifact("bench", train, root=root, reuse=False)
+        control = os.path.join(directory, "control.json")
+        write_realistic(control, n)
+        for compiled in (False, True):
+            samples = [_peak_rss(_COLD_SCORE.format(compiled=compiled), directory) for _ in range(repeat)]
+            seconds, rss = np.median([t for t, _ in samples]), np.median([m for _, m in samples])
+            label = "compiled" if compiled else "библиотеки"
+            print(f"холодный старт, {label:>10}: {seconds:5.2f} с, пик RSS {rss:5.0f} МБ")
+
+        libraries = load_artifact("bench", root=root, compiled=False)
+        compiled = load_artifact("bench", root=root, compiled=True)
+        X = libraries.transform(next(iter_dataset(control, n)))
+        expected, t_libraries = timed(ensemble_proba, libraries.models, X)
+        proba, t_compiled = timed(compiled.compiled.proba, X)
+        print(f"{n} строк: библиотеки {n / t_libraries:8.0f} строк/с, compiled {n / t_compiled:8.0f} строк/с "
+              f"(x{t_libraries / t_compiled:.2f}); макс. расхождение {np.abs(proba - expected).max():.1e}")
+
+
+def bench_thresholds(sizes=(100_000, 1_000_000)):
+    from sklearn.metrics import classification_report
+    from thresholds import DEFAULT_THRESHOLDS, threshold_curve
+    print("=== Подбор порога: 41 × classification_report vs threshold_curve ===")
+    rng = np.random.default_rng(0)
+    for n in sizes:
+        y = rng.random(n) > 0.6
+        proba = np.clip(rng.normal(0.4 + 0.2 * y, 0.2), 0, 1)
+
+        def legacy():
+            return [classification_report(y, (proba > t).astype(int), output_dict=True) for t in DEFAULT_THRESHOLDS]
+
+        _, t_legacy = timed(legacy)
+        _, t_curve = timed(threshold_curve, y, proba)
+        _, t_all = timed(threshold_curve, y, proba, None)
+        print(f"{n:>9} строк: {t_legacy:7.2f} с → {t_curve:6.3f} с (все различные пороги: {t_all:6.3f} с)")
+
+
+def legacy_merge(records, account_ids, proba, labels):
+    # Прежняя запись результатов из damnit_json.py: O(N×M)
+    export_data = [{"accountId": a, "probability_isCommercial": p, "isCommercial": l}
+                   for a, p, l in zip(account_ids, proba, labels)]
+    for i in export_data:
+        for j, m in enumerate(records):
+            if i["accountId"] == m["accountId"]:
+                records[j]["isCommercial"] = i["isCommercial"]
+                records[j]["probability_isCommercial"] = i["probability_isCommercial"]
+
+
+def bench_merge(sizes=(1_000, 4_000, 16_000, 100_000, 1_000_000), legacy_limit=16_000):
+    from predictions import attach_predictions, write_sorted_predictions
+    print("=== Слияние предсказаний: время на строку должно быть постоянным ===")
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "sorted.json")
+        for n in sizes:
+            records = [{"accountId": i + 1} for i in range(n)]
+            account_ids = rng.permutation(n) + 1
+            proba = rng.random(n)
+            labels = proba > 0.5
+            merged, t_index = timed(attach_predictions, records, proba, labels, account_ids)
+            # Вероятности в порядке записей, как их отдаёт attach_predictions
+            aligned = np.fromiter((record["probability_isCommercial"] for record in merged), np.float64, n)
+            if n <= legacy_limit:
+                legacy = [{"accountId": i + 1} for i in range(n)]
+                _, t_legacy = timed(legacy_merge, legacy, account_ids.tolist(), proba.tolist(), labels.tolist())
+                write_sorted_predictions(merged, aligned, path)
+                with open(path, encoding="utf-8") as f:
+                    assert json.load(f) == sorted(legacy, key=lambda x: x["probability_isCommercial"], reverse=True)
+            _, t_write = timed(write_sorted_predictions, merged, aligned, path)
+            line = (f"{n:>9} строк: индекс {t_index:6.3f} с ({t_index / n * 1e6:5.2f} мкс/строка), "
+                    f"запись {t_write:6.2f} с ({t_write / n * 1e6:5.2f} мкс/строка)")
+            if n <= legacy_limit:
+                line += f"; O(N×M) {t_legacy:7.2f} с ({t_legacy / n * 1e6:8.1f} мкс/строка)"
+            print(line)
+
+
+async def _seed_db(db_url, n, chunk_size=5_000):
+    import convert
+    await convert.init_db(db_url)
+    data = make_predictions(n)
+    for start in range(0, n, chunk_size):
+        await convert.insert_chunk(data[start:start + chunk_size])
+
+
+@contextlib.contextmanager
+def _uncached_responses():
+    # Замеры эндпоинтов API, а не попаданий в кэш ответов
+    import BAckend2
+    saved = BAckend2.response_cache.max_entries
+    BAckend2.response_cache.max_entries = 0
+    BAckend2.response_cache.clear()
+    try:
+        yield
+    finally:
+        BAckend2.response_cache.max_entries = saved
+
+
+async def _latency(client, url, repeat=5):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = await client.get(url)
+        samples.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.text
+    return np.median(samples) * 1000, response
+
+
+def bench_pagination(n=200_000, per_page=200, pages=(1, 10, 100, 500, 1000)):
+    import httpx
+    from tortoise import Tortoise
+    from BAckend2 import app, encode_cursor
+    from Backend1 import ElectricityConsumer
+
+    async def run(db_url):
+        await _seed_db(db_url, n)
+        try:
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+                for page in pages:
+                    offset_ms, by_offset = await _latency(client, f"/consumers/?page={page}&per_page={per_page}")
+                    # Курсор на ту же глубину — ключ последней строки предыдущей страницы
+                    line = f"стр. {page:>5}: OFFSET {offset_ms:7.1f} мс"
+                    if page > 1:
+                        last = await ElectricityConsumer.all().order_by("-is_commercial_prob", "-account_id") \
+                            .offset((page - 1) * per_page - 1).first()
+                        cursor_ms, by_cursor = await _latency(client, f"/consumers/?after={encode_cursor(last)}&per_page={per_page}")
+                        assert by_cursor.json() == by_offset.json()
+                        line += f", курсор {cursor_ms:7.1f} мс"
+                    print(line)
+        finally:
+            await Tortoise.close_connections()
+
+    print(f"=== /consumers/: OFFSET vs курсор, {n} потребителей (SQLite) ===")
+    with tempfile.TemporaryDirectory() as directory:
+        with _uncached_responses():
+            asyncio.run(run(f"sqlite://{directory}/pagination.db"))
+
+
+def bench_search(n=300_000, queries=("Ленина", "ул Ленина, д. 12", "краснодар", "д. 7", "нет такого адреса")):
+    from search_index import AddressIndex
+    print(f"=== Поиск по адресу: индекс триграмм, {n} потребителей ===")
+    data = make_predictions(n)
+    rows = [(e["accountId"], e["address"], e["isCommercial"], e["buildingType"], e.get("roomsCount", 0),
+             e.get("totalArea"), e["probability_isCommercial"]) for e in data]
+    index, t_build = timed(AddressIndex, rows)
+    print(f"построение индекса: {t_build:.2f} с")
+    for query in queries:
+        samples = [timed(index.search, query, limit=20)[1] for _ in range(20)]
+        filtered = [timed(index.search, query, is_commercial=True, min_prob=0.8, limit=20)[1] for _ in range(20)]
+        print(f"{query!r:>22}: {np.median(samples) * 1000:6.2f} мс, с фильтрами {np.median(filtered) * 1000:6.2f} мс")
+
+
+def bench_serialization(n=20_000, per_page=400, repeat=20):
+    import httpx
+    import BAckend2
+    from tortoise import Tortoise
+
+    async def measure(client, url):
+        wall, cpu = [], []
+        for _ in range(repeat):
+            start, start_cpu = time.perf_counter(), time.process_time()
+            response = await client.get(url)
+            wall.append(time.perf_counter() - start)
+            cpu.append(time.process_time() - start_cpu)
+        assert response.status_code == 200
+        return np.median(wall) * 1000, np.median(cpu) * 1000, response.json()
+
+    async def run(db_url):
+        await _seed_db(db_url, n)
+        try:
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=BAckend2.app), base_url="http://bench") as client:
+                for url in (f"/consumers/?per_page={per_page}", "/dashboard/1"):
+                    results = {}
+                    for fast in (False, True):
+                        BAckend2.FAST_SERIALIZATION = fast
+                        results[fast] = await measure(client, url)
+                    assert results[False][2] == results[True][2]
+                    (wall_old, cpu_old, _), (wall_new, cpu_new, _) = results[False], results[True]
+                    print(f"{url:>28}: Pydantic {wall_old:6.1f} мс (CPU {cpu_old:6.1f}) → "
+                          f"values+orjson {wall_new:6.1f} мс (CPU {cpu_new:6.1f})")
+        finally:
+            BAckend2.FAST_SERIALIZATION = True
+            await Tortoise.close_connections()
+
+    print("=== Сериализация ответов /consumers/ и /dashboard/ (SQLite) ===")
+    with tempfile.TemporaryDirectory() as directory:
+        with _uncached_responses():
+            asyncio.run(run(f"sqlite://{directory}/serialization.db"))
+
+
+def _count_queries(connection):
+    # Счётчик SELECT-запросов на соединении: обёртки над execute_query*
+    counter = {"queries": 0}
+    for name in ("execute_query", "execute_query_dict"):
+        method = getattr(connection, name)
+
+        async def counted(*args, _method=method, **kwargs):
+            counter["queries"] += 1
+            return await _method(*args, **kwargs)
+
+        setattr(connection, name, counted)
+    return counter
+
+
+def bench_consumption_storage(n=20_000, per_page=200, repeat=20):
+    import httpx
+    import Backend1
+    import BAckend2
+    import migrate
+    from tortoise import Tortoise
+
+    async def measure(client, counter, url):
+        samples = []
+        for _ in range(repeat):
+            counter["queries"] = 0
+            start = time.perf_counter()
+            response = await client.get(url)
+            samples.append(time.perf_counter() - start)
+        assert response.status_code == 200
+        return np.median(samples) * 1000, counter["queries"], response.json()
+
+    async def run(db_url):
+        await _seed_db(db_url, n)
+        await migrate.pack_monthly_rows()
+        counter = _count_queries(Tortoise.get_connection("default"))
+        try:
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=BAckend2.app), base_url="http://bench") as client:
+                for url in (f"/consumers/?per_page={per_page}", "/dashboard/1"):
+                    for fast in (False, True):
+                        BAckend2.FAST_SERIALIZATION = fast
+                        results = {}
+                        for storage in ("rows", "packed"):
+                            Backend1.CONSUMPTION_STORAGE = storage
+                            results[storage] = await measure(client, counter, url)
+                        assert results["rows"][2] == results["packed"][2]
+                        (ms_rows, q_rows, _), (ms_packed, q_packed, _) = results["rows"], results["packed"]
+                        mode = "values+orjson" if fast else "Pydantic"
+                        print(f"{url:>28} ({mode:>13}): rows {ms_rows:6.1f} мс, {q_rows} запр. → "
+                              f"packed {ms_packed:6.1f} мс, {q_packed} запр.")
+        finally:
+            Backend1.CONSUMPTION_STORAGE = storage_setting
+            BAckend2.FAST_SERIALIZATION = True
+            await Tortoise.close_connections()
+
+    storage_setting = Backend1.CONSUMPTION_STORAGE
+    print(f"=== Помесячное потребление: строки MonthlyConsumption vs packed, {n} потребителей (SQLite) ===")
+    with tempfile.TemporaryDirectory() as directory:
+        with _uncached_responses():
+            asyncio.run(run(f"sqlite://{directory}/storage.db"))
+
+
+def bench_export(sizes=(20_000, 200_000), per_page=400, paging_limit=50_000):
+    import tracemalloc
+    import httpx
+    import Backend1
+    import BAckend2
+    import migrate
+    from tortoise import Tortoise
+
+    async def stream(fmt, trace=False):
+        # Тело ответа читается и отбрасывается по частям, как у клиента, пишущего в файл;
+        # при trace — пиковая память Python за выгрузку
+        if trace:
+            tracemalloc.start()
+        start = time.perf_counter()
+        response = await BAckend2.export_consumers(format=fmt, min_prob=None, is_commercial=None, district=None)
+        size = 0
+        async for chunk in response.body_iterator:
+            size += len(chunk)
+        seconds = time.perf_counter() - start
+        peak = 0
+        if trace:
+            peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+            tracemalloc.stop()
+        return seconds, size / 2 ** 20, peak
+
+    async def page_through(client):
+        start = time.perf_counter()
+        page = rows = 0
+        while True:
+            page += 1
+            items = (await client.get(f"/consumers/?page={page}&per_page={per_page}")).json()
+            rows += len(items)
+            if len(items) < per_page:
+                return time.perf_counter() - start, rows
+
+    async def run(db_url, n):
+        await _seed_db(db_url, n)
+        with contextlib.redirect_stdout(io.StringIO()):
+            await migrate.pack_monthly_rows()
+        try:
+            for storage in ("rows", "packed"):
+                Backend1.CONSUMPTION_STORAGE = storage
+                for fmt in ("ndjson", "csv"):
+                    seconds, mb, _ = await stream(fmt)
+                    _, _, peak = await stream(fmt, trace=True)
+                    print(f"{n:>8} строк, {storage:>6}, {fmt:>6}: {seconds:6.2f} с, {n / seconds:8.0f} строк/с, "
+                          f"{mb:6.1f} МБ, пик памяти {peak:5.1f} МБ")
+                if n <= paging_limit:
+                    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=BAckend2.app),
+                                                 base_url="http://bench") as client:
+                        seconds, rows = await page_through(client)
+                    assert rows == n
+                    print(f"{n:>8} строк, {storage:>6}, /consumers/?page= по {per_page}: {seconds:6.2f} с, "
+                          f"{n / seconds:8.0f} строк/с")
+        finally:
+            Backend1.CONSUMPTION_STORAGE = storage_setting
+            await Tortoise.close_connections()
+
+    storage_setting = Backend1.CONSUMPTION_STORAGE
+    print("=== /consumers/export: потоковая выгрузка vs постраничный обход (SQLite) ===")
+    for n in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            with _uncached_responses():
+                asyncio.run(run(f"sqlite://{directory}/export.db", n))
+
+
+def bench_score(n_train=5_000, levels=(1, 8, 32, 128), requests_per_level=512):
+    import httpx
+    import BAckend2
+    from registry import train_artifact
+    from scoring import MicroBatcher
+
+    async def run(batcher):
+        BAckend2.score_batcher = batcher
+        records = make_consumers(requests_per_level, seed=1)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=BAckend2.app), base_url="http://bench") as client:
+            # Некорректная запись отклоняется валидацией и не доходит до батча
+            response = await client.post("/score", json=[records[0], {"consumption": [1, 2]}])
+            assert response.status_code == 422 and batcher.requests == 0, response.text
+            results = {}
+            for level in levels:
+                latencies = []
+                queue = list(records)
+
+                async def worker():
+                    while queue:
+                        record = queue.pop()
+                        start = time.perf_counter()
+                        response = await client.post("/score", json=record)
+                        latencies.append(time.perf_counter() - start)
+                        assert response.status_code == 200, response.text
+
+                start = time.perf_counter()
+                await asyncio.gather(*(worker() for _ in range(level)))
+                elapsed = time.perf_counter() - start
+                results[level] = (len(latencies) / elapsed, np.percentile(latencies, 50) * 1000,
+                                  np.percentile(latencies, 99) * 1000)
+            return results
+
+    print("=== /score: микробатчинг, запросы по одной записи ===")
+    with tempfile.TemporaryDirectory() as directory:
+        path = write_json(make_consumers(n_train), directory, "train.json")
+        artifact = train_artifact("bench", path, root=os.path.join(directory, "models"), reuse=False)
+        BAckend2.score_artifact = artifact
+        try:
+            single = asyncio.run(run(MicroBatcher(artifact.score, 1, 0, BAckend2.score_executor)))
+            batched = asyncio.run(run(MicroBatcher(artifact.score, BAckend2.SCORE_MAX_BATCH,
+                                                   BAckend2.SCORE_MAX_WAIT_MS / 1000, BAckend2.score_executor)))
+        finally:
+            BAckend2.score_batcher = BAckend2.score_artifact = None
+        for level in levels:
+            (rps_1, p50_1, p99_1), (rps_b, p50_b, p99_b) = single[level], batched[level]
+            print(f"{level:>4} клиентов: по одной {rps_1:7.0f} запр/с (p50 {p50_1:6.1f} мс, p99 {p99_1:6.1f} мс) → "
+                  f"батчи {rps_b:7.0f} запр/с (p50 {p50_b:6.1f} мс, p99 {p99_b:6.1f} мс)")
+
+
+def bench_sharded_scoring(n=200_000, n_train=20_000, workers=None):
+    # Масштабирование batch_scoring.py по числу процессов; ускорение близко к линейному,
+    # пока ядер хватает (на однопроцессорной машине все уровни одинаковы)
+    from batch_scoring import score_sharded
+    from columnar import json_to_columnar
+    from registry import train_artifact
+    from synthetic import write_realistic
+    cores = os.cpu_count() or 1
+    workers = workers or sorted({1, 2, 4, 8, cores} & set(range(1, cores + 1)))
+    print(f"=== batch_scoring: {n} записей, процессов {workers} ({cores} ядер) ===")
+    with tempfile.TemporaryDirectory() as directory:
+        root = os.path.join(directory, "models")
+        train = os.path.join(directory, "train.json")
+        write_realistic(train, n_train, seed=1)
+        with contextlib.redirect_stdout(io.StringIO()):
+            train_artifact("bench", train, root=root, reuse=False)
+        source = os.path.join(directory, "control.json")
+        write_realistic(source, n)
+        cols = os.path.join(directory, "control.cols")
+        json_to_columnar(source, cols)
+        output = os.path.join(directory, "out.jsonl")
+        base = {}
+        for label, path in (("JSON", source), ("колонки", cols)):
+            for count in workers:
+                _, seconds = timed(score_sharded, path, output, "bench", root=root, workers=count, verbose=False)
+                base.setdefault(label, seconds)
+                print(f"{label:>8}, {count:>2} проц.: {seconds:7.2f} с, {n / seconds:8.0f} строк/с "
+                      f"(x{base[label] / seconds:.2f})")
+
+
+# === Сквозной прогон конвейера: python bench.py pipeline ===
+# Реалистичные синтетические наборы (synthetic.py) размером ELECTRICITY_BENCH_SIZES
+# проходят все этапы: генерация, разбор, признаки, обучение, скоринг, склейка
+# с предсказаниями, загрузка в БД и API под конкурентной нагрузкой. Каждый этап —
+# отдельный процесс (свой пик RSS, без прогретых кэшей предыдущего этапа).
+# Результаты дописываются строкой в ELECTRICITY_BENCH_RESULTS (JSON Lines)
+# и сравниваются с предыдущим прогоном.
+# БД — SQLite во временном каталоге или ELECTRICITY_BENCH_DB_URL (например, локальный MySQL).
+
+PIPELINE_SIZES = [int(n) for n in os.environ.get("ELECTRICITY_BENCH_SIZES", "10000,100000").split(",")]
+PIPELINE_STAGES = ("generate", "parse", "featurize", "train", "score", "merge", "ingest", "api")
+RESULTS_PATH = os.environ.get("ELECTRICITY_BENCH_RESULTS", "bench_results.jsonl")
+API_CONCURRENCY = (1, 16, 64)
+API_REQUESTS = 500
+SEARCH_QUERIES = ["Ленина", "ул Мира, д. 1", "краснодар", "Солнечная", "д. 7", "ст-ца Полтавская"]
+
+
+def _stage_generate(directory, n):
+    from synthetic import write_realistic
+    path = os.path.join(directory, "train.json")
+    write_realistic(path, n)
+    return {"rows": n, "bytes": os.path.getsize(path)}
+
+
+def _stage_parse(directory, n):
+    from columnar import iter_dataset
+    rows = sum(len(batch) for batch in iter_dataset(os.path.join(directory, "train.json")))
+    return {"rows": rows}
+
+
+def _stage_featurize(directory, n):
+    from columnar import iter_dataset
+    from features import update_categories
+    categories, rows, compute = [], 0, 0.0
+    for batch in iter_dataset(os.path.join(directory, "train.json")):
+        update_categories(categories, batch)
+        (X, _), seconds = timed(extract_features, batch, True, categories)
+        rows += len(X)
+        compute += seconds
+    return {"rows": rows, "compute_seconds": compute}
+
+
+def _stage_train(directory, n):
+    from registry import train_artifact
+    train_artifact("bench", os.path.join(directory, "train.json"), extended=True,
+                   reuse=False, root=os.path.join(directory, "models"))
+    return {"rows": n}
+
+
+def _stage_score(directory, n):
+    from columnar import iter_dataset
+    from registry import load_artifact
+    artifact = load_artifact("bench", root=os.path.join(directory, "models"))
+    parts, compute = [], 0.0
+    for batch in iter_dataset(os.path.join(directory, "train.json")):
+        proba, seconds = timed(artifact.score, batch)
+        parts.append(proba)
+        compute += seconds
+    proba = np.concatenate(parts)
+    np.save(os.path.join(directory, "proba.npy"), proba)
+    return {"rows": len(proba), "compute_seconds": compute}
+
+
+def _stage_merge(directory, n):
+    # Как в damnit_json.py: весь набор в памяти, склейка по позиции и запись по убыванию вероятности
+    from columnar import load_dataset
+    from predictions import attach_predictions, write_sorted_predictions
+    records = load_dataset(os.path.join(directory, "train.json"))
+    proba = np.load(os.path.join(directory, "proba.npy"))
+    start = time.perf_counter()
+    attach_predictions(records, proba, proba > 0.5)
+    write_sorted_predictions(records, proba, os.path.join(directory, "predictions.json"))
+    return {"rows": len(records), "compute_seconds": time.perf_counter() - start}
+
+
+def _bench_db_url(directory):
+    return os.environ.get("ELECTRICITY_BENCH_DB_URL") or f"sqlite://{directory}/bench.db"
+
+
+def _stage_ingest(directory, n):
+    import convert
+    from tortoise import Tortoise
+
+    async def run():
+        await convert.init_db(_bench_db_url(directory))
+        try:
+            return await convert.insert_consumers_bulk(os.path.join(directory, "predictions.json"))
+        finally:
+            await Tortoise.close_connections()
+
+    return {"rows": asyncio.run(run())}
+
+
+def _latency_stats(latencies, elapsed):
+    ms = np.asarray(latencies) * 1000
+    return {"requests": len(ms), "requests_per_s": len(ms) / elapsed,
+            "p50_ms": float(np.percentile(ms, 50)), "p90_ms": float(np.percentile(ms, 90)),
+            "p99_ms": float(np.percentile(ms, 99)), "max_ms": float(ms.max())}
+
+
+def _stage_api(directory, n):
+    # Список, карточка и поиск под нагрузкой: API_REQUESTS запросов на каждый уровень конкурентности
+    import httpx
+    import convert
+    import BAckend2
+    from tortoise import Tortoise
+    rng = np.random.default_rng(0)
+    urls = {
+        "list": [f"/consumers/?page={page}&per_page=50" for page in rng.integers(1, 21, size=API_REQUESTS)],
+        "detail": [f"/dashboard/{account_id}" for account_id in rng.integers(1, n + 1, size=API_REQUESTS)],
+        "search": [f"/consumers/search?q={SEARCH_QUERIES[i]}" for i in rng.integers(0, len(SEARCH_QUERIES), size=API_REQUESTS)],
+    }
+
+    async def load(client, todo, concurrency):
+        latencies = []
+        queue = list(todo)
+
+        async def worker():
+            while queue:
+                url = queue.pop()
+                start = time.perf_counter()
+                response = await client.get(url)
+                latencies.append(time.perf_counter() - start)
+                assert response.status_code == 200, response.text
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return _latency_stats(latencies, time.perf_counter() - start)
+
+    async def run():
+        await convert.init_db(_bench_db_url(directory))
+        results = {}
+        try:
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=BAckend2.app), base_url="http://bench",
+                                         timeout=None) as client:
+                await client.get("/consumers/search?q=warmup")  # построение индекса поиска — не в замерах
+                for kind, todo in urls.items():
+                    for concurrency in API_CONCURRENCY:
+                        # Каждый уровень — с холодным кэшем ответов: URL те же
+                        BAckend2.response_cache.clear()
+                        results[f"{kind}@{concurrency}"] = await load(client, todo, concurrency)
+        finally:
+            await Tortoise.close_connections()
+        return results
+
+    return {"endpoints": asyncio.run(run())}
+
+
+def _stage_main(stage, directory, n):
+    # Точка входа процесса одного этапа: результат — последней строкой JSON в stdout
+    import resource
+    n = int(n)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = globals()[f"_stage_{stage}"](directory, n)
+    result["seconds"] = time.perf_counter() - start
+    result["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps(result))
+
+
+def _run_stage(stage, directory, n):
+    # cwd — временный каталог: catboost_info и кэши этапов не попадают в репозиторий
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = {**os.environ, "PYTHONPATH": here, "ELECTRICITY_FEATURE_CACHE": ""}
+    out = subprocess.run([sys.executable, os.path.join(here, "bench.py"), "--stage", stage, directory, str(n)],
+                         capture_output=True, text=True, check=True, cwd=directory, env=env)
+    return json.loads(out.stdout.splitlines()[-1])
+
+
+def _run_info():
+    import platform
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "commit": commit, "python": platform.python_version(),
+            "platform": platform.platform(), "cpu_count": os.cpu_count()}
+
+
+def _previous_run(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        lines = [line for line in f if line.strip()]
+    return json.loads(lines[-1]) if lines else None
+
+
+def bench_pipeline(sizes=None, stages=PIPELINE_STAGES, results_path=RESULTS_PATH):
+    sizes = sizes or PIPELINE_SIZES
+    previous = _previous_run(results_path)
+    before = {(r["n"], r["stage"]): r for r in previous["results"]} if previous else {}
+    run = {**_run_info(), "results": []}
+    print(f"=== Сквозной прогон конвейера: {', '.join(map(str, sizes))} потребителей ===")
+    for n in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            for stage in stages:
+                result = {"n": n, "stage": stage, **_run_stage(stage, directory, n)}
+                if "rows" in result:
+                    result["rows_per_s"] = result["rows"] / result["seconds"]
+                run["results"].append(result)
+                line = f"{n:>9} {stage:>10}: {result['seconds']:8.2f} с, пик RSS {result['peak_rss_mb']:7.0f} МБ"
+                if "rows_per_s" in result:
+                    line += f", {result['rows_per_s']:10.0f} строк/с"
+                old = before.get((n, stage))
+                if old:
+                    line += f" (было {old['seconds']:.2f} с, x{old['seconds'] / result['seconds']:.2f})"
+                print(line)
+                for name, stats in result.get("endpoints", {}).items():
+                    print(f"{'':>21}{name:>12}: {stats['requests_per_s']:7.0f} запр/с, p50 {stats['p50_ms']:6.1f} мс, "
+                          f"p90 {stats['p90_ms']:6.1f} мс, p99 {stats['p99_ms']:6.1f} мс")
+    with open(results_path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(run, ensure_ascii=False) + "\n")
+    print(f"Результаты дописаны в {results_path}")
+    return run
+
+
+BENCHMARKS = {
+    "features": bench_features,
+    "ingest": bench_ingest,
+    "stream": bench_stream,
+    "columnar": bench_columnar,
+    "feature_cache": bench_feature_cache,
+    "buildings": bench_buildings,
+    "ensemble": bench_ensemble,
+    "compiled": bench_compiled,
+    "thresholds": bench_thresholds,
+    "merge": bench_merge,
+    "pagination": bench_pagination,
+    "search": bench_search,
+    "serialization": bench_serialization,
+    "consumption_storage": bench_consumption_storage,
+    "export": bench_export,
+    "score": bench_score,
+    "sharded_scoring": bench_sharded_scoring,
+    "pipeline": bench_pipeline,
+}
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--stage"]:
+        _stage_main(*sys.argv[2:5])
+    else:
+        for name in sys.argv[1:] or list(BENCHMARKS):
+            BENCHMARKS[name]()
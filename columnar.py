@@ -0,0 +1,242 @@
+import json
+import os
+import sys
+import numpy as np
+from jsonstream import JsonWriter, iter_batches
+from metrics import stage
+
+# === Колоночный формат хранения потребителей ===
+# Набор — это каталог: meta.json (число строк, раскладки ключей, словари строк)
+# и по одному бинарному файлу фиксированной ширины на колонку.
+# Чтение идёт через np.memmap, т.е. колонки — это представления без копирования.
+#
+# Пропуски: -1 в целочисленных колонках и в кодах словарей, NaN во float-колонках.
+# consumption_mask: биты 0..11 — месяц присутствует, бит 12 — есть само поле consumption.
+# layout — код порядка ключей записи, чтобы обратная выгрузка в JSON совпадала с исходной.
+
+FORMAT_VERSION = 1
+META_FILE = "meta.json"
+HAS_CONSUMPTION = 1 << 12
+# Первые части адреса; остаток («д. 37 1, кв. 5») хранится одной строкой в house
+ADDRESS_PARTS = ["region", "district", "settlement", "street"]
+STRING_COLUMNS = ["buildingType"] + ADDRESS_PARTS + ["house"]
+
+COLUMNS = {
+    "accountId": ("<i4", ()),
+    "isCommercial": ("i1", ()),
+    "roomsCount": ("<i4", ()),
+    "residentsCount": ("<i4", ()),
+    "totalArea": ("<f8", ()),
+    "probability_isCommercial": ("<f8", ()),
+    "consumption": ("<i4", (12,)),
+    "consumption_mask": ("<u2", ()),
+    "layout": ("<i4", ()),
+}
+COLUMNS.update({name: ("<i4", ()) for name in STRING_COLUMNS})
+
+
+def _column_file(path, name):
+    return os.path.join(path, f"{name}.bin")
+
+
+class _ColumnarWriter:
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self.layouts = {}
+        self.dictionaries = {name: {} for name in STRING_COLUMNS}
+        os.makedirs(path, exist_ok=True)
+        self._files = {name: open(_column_file(path, name), "wb") for name in COLUMNS}
+
+    def _codes(self, name, values):
+        dictionary = self.dictionaries[name]
+        return [-1 if v is None else dictionary.setdefault(v, len(dictionary)) for v in values]
+
+    def write(self, records):
+        n = len(records)
+        columns = {
+            "layout": [self.layouts.setdefault(tuple(e), len(self.layouts)) for e in records],
+            "accountId": [e.get("accountId", -1) for e in records],
+            "isCommercial": [-1 if e.get("isCommercial") is None else int(e["isCommercial"]) for e in records],
+            "roomsCount": [e.get("roomsCount", -1) for e in records],
+            "residentsCount": [e.get("residentsCount", -1) for e in records],
+            "totalArea": [e.get("totalArea", np.nan) for e in records],
+            "probability_isCommercial": [e.get("probability_isCommercial", np.nan) for e in records],
+            "buildingType": self._codes("buildingType", [e.get("buildingType") for e in records]),
+        }
+
+        months = np.zeros((n, 12), dtype="<i4")
+        mask = np.zeros(n, dtype="<u2")
+        parts = [[None] * n for _ in range(len(ADDRESS_PARTS) + 1)]
+        for i, entry in enumerate(records):
+            consumption = entry.get("consumption")
+            if consumption is not None:
+                bits = HAS_CONSUMPTION
+                for key, value in consumption.items():
+                    m = int(key) - 1
+                    months[i, m] = value
+                    bits |= 1 << m
+                mask[i] = bits
+            address = entry.get("address")
+            if address is not None:
+                split = address.split(", ", len(ADDRESS_PARTS))
+                for j, part in enumerate(split):
+                    parts[j][i] = part
+        columns["consumption"] = months
+        columns["consumption_mask"] = mask
+        for name, values in zip(ADDRESS_PARTS + ["house"], parts):
+            columns[name] = self._codes(name, values)
+
+        for name, (dtype, _) in COLUMNS.items():
+            self._files[name].write(np.asarray(columns[name], dtype=dtype).tobytes())
+        self.count += n
+
+    def close(self):
+        for file in self._files.values():
+            file.close()
+        meta = {
+            "version": FORMAT_VERSION,
+            "count": self.count,
+            "layouts": [list(layout) for layout in self.layouts],
+            "dictionaries": {name: list(d) for name, d in self.dictionaries.items()},
+        }
+        with open(os.path.join(self.path, META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+
+def write_columnar(batches, path):
+    writer = _ColumnarWriter(path)
+    try:
+        for batch in batches:
+            writer.write(batch)
+    finally:
+        writer.close()
+    return writer.count
+
+
+class ColumnarDataset:
+    # Колонки — атрибуты-массивы (accountId, roomsCount, consumption, ...).
+    # Срез ds[a:b] — тоже ColumnarDataset поверх тех же memmap без копирования,
+    # итерация даёт записи-словари в исходной JSON-раскладке.
+
+    def __init__(self, meta, columns):
+        self.meta = meta
+        self.layouts = meta["layouts"]
+        self.dictionaries = meta["dictionaries"]
+        self.columns = columns
+        for name, values in columns.items():
+            setattr(self, name, values)
+
+    def __len__(self):
+        return len(self.accountId)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return ColumnarDataset(self.meta, {name: values[key] for name, values in self.columns.items()})
+        return self.record(key)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.record(i)
+
+    def decode(self, name):
+        # Строковая колонка целиком; None — пропуск
+        dictionary = self.dictionaries[name]
+        return [dictionary[c] if c >= 0 else None for c in getattr(self, name).tolist()]
+
+    def addresses(self):
+        # Полные адреса всех строк (None — нет адреса), как в record()
+        parts = [self.decode(name) for name in ADDRESS_PARTS + ["house"]]
+        return [
+            ", ".join(part for part in row if part is not None) if row[0] is not None else None
+            for row in zip(*parts)
+        ]
+
+    def record(self, i):
+        values = {}
+        account_id = int(self.accountId[i])
+        if account_id != -1:
+            values["accountId"] = account_id
+        flag = int(self.isCommercial[i])
+        if flag != -1:
+            values["isCommercial"] = bool(flag)
+        parts = [getattr(self, name)[i] for name in ADDRESS_PARTS + ["house"]]
+        if parts[0] != -1:
+            values["address"] = ", ".join(
+                self.dictionaries[name][code]
+                for name, code in zip(ADDRESS_PARTS + ["house"], parts) if code != -1
+            )
+        code = int(self.buildingType[i])
+        if code != -1:
+            values["buildingType"] = self.dictionaries["buildingType"][code]
+        for name in ("roomsCount", "residentsCount"):
+            value = int(getattr(self, name)[i])
+            if value != -1:
+                values[name] = value
+        for name in ("totalArea", "probability_isCommercial"):
+            value = float(getattr(self, name)[i])
+            if value == value:
+                values[name] = value
+        mask = int(self.consumption_mask[i])
+        if mask & HAS_CONSUMPTION:
+            months = self.consumption[i].tolist()
+            values["consumption"] = {str(m + 1): months[m] for m in range(12) if mask & (1 << m)}
+        # Поля вне формата (например, has_business) не хранятся
+        return {key: values[key] for key in self.layouts[self.layout[i]] if key in values}
+
+
+def open_columnar(path):
+    with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+        meta = json.load(f)
+    count = meta["count"]
+    columns = {}
+    for name, (dtype, shape) in COLUMNS.items():
+        if count == 0:
+            columns[name] = np.empty((0,) + shape, dtype=dtype)
+        else:
+            columns[name] = np.memmap(_column_file(path, name), dtype=dtype, mode="r", shape=(count,) + shape)
+    return ColumnarDataset(meta, columns)
+
+
+def is_columnar(path):
+    return os.path.isfile(os.path.join(path, META_FILE))
+
+
+def load_dataset(path):
+    # Каталог колоночного формата или JSON-файл (массив / JSON Lines)
+    if is_columnar(path):
+        return open_columnar(path)
+    with stage("load"), open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def iter_dataset(path, batch_size=10_000):
+    if is_columnar(path):
+        dataset = open_columnar(path)
+        for start in range(0, len(dataset), batch_size):
+            yield dataset[start:start + batch_size]
+    else:
+        yield from iter_batches(path, batch_size)
+
+
+def json_to_columnar(json_path, path, batch_size=100_000):
+    return write_columnar(iter_batches(json_path, batch_size), path)
+
+
+def columnar_to_json(path, json_path, indent=None, separators=(",", ":")):
+    # По умолчанию — компактная раскладка dataset_train.json; indent=2 — как у предсказаний
+    with JsonWriter(json_path, indent=indent, separators=separators) as writer:
+        writer.write_many(open_columnar(path))
+    return writer.count
+
+
+if __name__ == "__main__":
+    # python columnar.py dataset_train.json dataset_train.cols
+    # python columnar.py dataset_train.cols dataset_train.json [indent]
+    source, target = sys.argv[1], sys.argv[2]
+    if is_columnar(source):
+        indent = int(sys.argv[3]) if len(sys.argv) > 3 else None
+        columnar_to_json(source, target, indent, None if indent else (",", ":"))
+    else:
+        json_to_columnar(source, target)
@@ -0,0 +1,307 @@
+import itertools
+import json
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+# === Компилированный ансамбль: деревья в массивах NumPy ===
+# Обученные XGBoost, LightGBM и CatBoost переводятся в массивы (compiled.npz рядом
+# с bundle.pkl), и вероятности ансамбля считаются одним NumPy без библиотек
+# бустинга, sklearn и pandas: холодный старт скоринга — чтение одного .npz.
+#
+# Все разбиения приводятся к виду «вправо, если x > t»; правило XGBoost «влево,
+# если x < t» в float32 — это «вправо, если x > предыдущего float32 перед t».
+# XGBoost и CatBoost сравнивают значения в float32, LightGBM — в float64.
+# Пороги каждого признака упорядочены, и значение признака одним searchsorted
+# превращается в номер интервала b: верны ровно сравнения с первыми b порогами.
+# Поэтому вклад признака во все деревья члена — строка таблицы по b:
+#   XGBoost, LightGBM — маски листьев (как в QuickScorer): дерево дополнено до полного
+#     глубины depth, разбиение «вправо» вычёркивает листья левого поддерева; маски
+#     признаков складываются через AND, выход — самый левый оставшийся лист;
+#   CatBoost — симметричные деревья: бит уровня «вправо» даёт номер листа (OR битов),
+#     значение — из таблицы листьев дерева.
+# На вход — матрица после импутации, как её получают модели.
+#
+#   python compiled_trees.py [имя модели] [версия]   — скомпилировать версию из реестра
+
+COMPILED = "compiled.npz"
+FORMAT_VERSION = 1
+MAX_DEPTH = 6  # маска листьев — uint64
+CHUNK_ROWS = 256  # состояние (строки × деревья) куска помещается в кэш
+# Вид таблиц по членам ансамбля
+MEMBER_SPLITS = {"xgb": "leaf_mask", "lgb": "leaf_mask", "cat": "oblivious"}
+FLOAT32_MEMBERS = ("xgb", "cat")
+
+
+def _sigmoid(margin):
+    return 1 / (1 + np.exp(-margin))
+
+
+def _mask_dtype(bits):
+    for dtype in (np.uint8, np.uint16, np.uint32, np.uint64):
+        if np.iinfo(dtype).bits >= bits:
+            return dtype
+    raise ValueError(f"Деревья глубже {MAX_DEPTH} не поддерживаются")
+
+
+def _xgb_trees(model):
+    # Деревья — {номер узла: (признак, порог, левый, правый, значение листа)}, корень 0
+    booster = model.get_booster()
+    names = booster.feature_names
+    trees = []
+    for dump in booster.get_dump(dump_format="json"):
+        nodes = {}
+        stack = [json.loads(dump)]
+        while stack:
+            node = stack.pop()
+            if "leaf" in node:
+                nodes[node["nodeid"]] = (0, 0.0, None, None, node["leaf"])
+                continue
+            split = node["split"]
+            index = names.index(split) if names else int(split[1:])
+            threshold = float(np.nextafter(np.float32(node["split_condition"]), np.float32(-np.inf)))
+            nodes[node["nodeid"]] = (index, threshold, node["yes"], node["no"], 0.0)
+            stack.extend(node["children"])
+        trees.append(nodes)
+    params = json.loads(booster.save_config())["learner"]["learner_model_param"]
+    base_score = float(params["base_score"].strip("[]"))
+    # binary:logistic: base_score задан как вероятность, в сумму входит его логит
+    return trees, float(np.log(base_score / (1 - base_score)))
+
+
+def _lgb_trees(model):
+    trees = []
+    for info in model.booster_.dump_model()["tree_info"]:
+        nodes = {}
+        numbers = itertools.count(1)
+        stack = [(0, info["tree_structure"])]
+        while stack:
+            number, node = stack.pop()
+            if "leaf_value" in node:
+                nodes[number] = (0, 0.0, None, None, node["leaf_value"])
+                continue
+            if node["decision_type"] != "<=":
+                raise ValueError(f"LightGBM: неподдерживаемое разбиение {node['decision_type']}")
+            left, right = next(numbers), next(numbers)
+            nodes[number] = (node["split_feature"], node["threshold"], left, right, 0.0)
+            stack.extend([(left, node["left_child"]), (right, node["right_child"])])
+        trees.append(nodes)
+    return trees, 0.0
+
+
+def _cat_trees(model):
+    # Описание модели — через экспорт CatBoost в JSON.
+    # Деревья — (список (признак, граница) по уровням, значения листьев)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "model.json")
+        model.save_model(path, format="json")
+        with open(path, encoding="utf-8") as f:
+            description = json.load(f)
+    flat = {info["feature_index"]: info["flat_feature_index"]
+            for info in description["features_info"]["float_features"]}
+    trees = []
+    for tree in description["oblivious_trees"]:
+        splits = []
+        for split in tree["splits"]:
+            if split["split_type"] != "FloatFeature":
+                raise ValueError(f"CatBoost: неподдерживаемое разбиение {split['split_type']}")
+            splits.append((flat[split["float_feature_index"]], split["border"]))
+        trees.append((splits, tree["leaf_values"]))
+    scale, bias = description["scale_and_bias"]
+    return trees, scale, float(np.sum(bias))
+
+
+def _depth(nodes, node=0):
+    _, _, left, right, _ = nodes[node]
+    if left is None:
+        return 0
+    return 1 + max(_depth(nodes, left), _depth(nodes, right))
+
+
+def _leaf_mask_splits(trees):
+    # Разбиения (дерево, признак, порог, маска) и листья полных деревьев глубины depth.
+    # Лист выше последнего уровня занимает все слоты своего поддерева
+    depth = max(_depth(nodes) for nodes in trees)
+    if depth > MAX_DEPTH:
+        raise ValueError(f"Деревья глубже {MAX_DEPTH} не поддерживаются")
+    dtype = _mask_dtype(2 ** depth)
+    full = (1 << 2 ** depth) - 1
+    splits = []
+    leaves = np.zeros((len(trees), 2 ** depth))
+    for t, nodes in enumerate(trees):
+        stack = [(0, 0, 2 ** depth)]  # узел и его слоты листьев [lo, hi)
+        while stack:
+            node, lo, hi = stack.pop()
+            feature, threshold, left, right, value = nodes[node]
+            if left is None:
+                leaves[t, lo:hi] = value
+                continue
+            middle = (lo + hi) // 2
+            left_slots = ((1 << (middle - lo)) - 1) << lo
+            splits.append((t, feature, threshold, full & ~left_slots))
+            stack.extend([(left, lo, middle), (right, middle, hi)])
+    return splits, leaves, dtype, full
+
+
+def _oblivious_splits(trees):
+    depth = max(len(splits) for splits, _ in trees)
+    if depth > MAX_DEPTH:
+        raise ValueError(f"Деревья глубже {MAX_DEPTH} не поддерживаются")
+    splits = []
+    leaves = np.zeros((len(trees), 2 ** depth))
+    for t, (levels, values) in enumerate(trees):
+        for level, (feature, border) in enumerate(levels):
+            splits.append((t, feature, border, 1 << level))
+        leaves[t, :len(values)] = values
+    return splits, leaves, _mask_dtype(depth), 0
+
+
+def _feature_tables(splits, n_features, n_trees, dtype, initial):
+    # Пороги признака f — thresholds[offsets[f]:offsets[f + 1]] по возрастанию;
+    # строка tables[offsets[f] + f + b] — накопленный вклад первых b порогов
+    # в каждое дерево: AND масок (initial — все листья) или OR битов (initial = 0)
+    combine = np.bitwise_or if initial == 0 else np.bitwise_and
+    thresholds, offsets, tables = [], [0], []
+    for feature in range(n_features):
+        own = sorted((threshold, t, value) for t, f, threshold, value in splits if f == feature)
+        unique = sorted({threshold for threshold, _, _ in own})
+        position = {threshold: i for i, threshold in enumerate(unique)}
+        table = np.full((len(unique) + 1, n_trees), initial, dtype=dtype)
+        for threshold, t, value in own:
+            row = table[position[threshold] + 1]
+            row[t] = combine(row[t], dtype(value))
+        tables.append(combine.accumulate(table, axis=0))
+        thresholds.extend(unique)
+        offsets.append(len(thresholds))
+    return np.array(thresholds, dtype=np.float64), np.array(offsets), np.concatenate(tables)
+
+
+def _member_arrays(name, kind, splits, leaves, dtype, initial, n_features, base_margin):
+    thresholds, offsets, tables = _feature_tables(splits, n_features, len(leaves), dtype, initial)
+    return {
+        f"{name}_kind": np.array(kind),
+        f"{name}_thresholds": thresholds,
+        f"{name}_offsets": offsets,
+        f"{name}_tables": tables,
+        f"{name}_initial": np.array(initial, dtype=dtype),
+        f"{name}_leaves": leaves,
+        f"{name}_base_margin": np.array(base_margin),
+    }
+
+
+def _lowest_bit(masks):
+    # Номер младшего установленного бита: x & -x — степень двойки, log2 в float64 точен
+    return np.log2((masks & (~masks + 1)).astype(np.float64)).astype(np.intp)
+
+
+class _Member:
+    __slots__ = ("kind", "thresholds", "offsets", "tables", "initial", "leaves", "base_margin", "leaf_offsets")
+
+    def __init__(self, name, arrays):
+        for field in self.__slots__[:-1]:
+            setattr(self, field, arrays[f"{name}_{field}"])
+        self.kind = str(self.kind)
+        self.base_margin = float(self.base_margin)
+        self.leaf_offsets = np.arange(len(self.leaves)) * self.leaves.shape[1]
+
+    def bins(self, X):
+        # Номера интервалов значений по порогам признаков — сразу для всех строк
+        bins = {}
+        for feature in range(X.shape[1]):
+            start, stop = self.offsets[feature], self.offsets[feature + 1]
+            if start != stop:
+                bins[feature] = np.searchsorted(self.thresholds[start:stop], X[:, feature]) + (start + feature)
+        return bins
+
+    def margin(self, bins, start, stop):
+        # Маржа строк start:stop по номерам интервалов из bins()
+        state = np.full((stop - start, len(self.leaves)), self.initial)
+        combine = np.bitwise_and if self.kind == "leaf_mask" else np.bitwise_or
+        for rows in bins.values():
+            combine(state, self.tables[rows[start:stop]], out=state)
+        leaf = _lowest_bit(state) if self.kind == "leaf_mask" else state.astype(np.intp)
+        return self.leaves.ravel()[self.leaf_offsets + leaf].sum(axis=1) + self.base_margin
+
+
+class CompiledEnsemble:
+    # Массивы из compile_ensemble/load_compiled; proba() совпадает с
+    # ensemble.ensemble_proba в пределах ошибки округления
+
+    def __init__(self, arrays):
+        self.arrays = arrays
+        self.statistics = arrays["imputer_statistics"]
+        self.members = {name: _Member(name, arrays) for name in MEMBER_SPLITS}
+
+    def impute(self, X):
+        # SimpleImputer(strategy="median").transform: NaN → медиана обучения
+        X = np.array(X, dtype=np.float64)
+        missing = np.isnan(X)
+        if missing.any():
+            X[missing] = np.take(self.statistics, np.nonzero(missing)[1])
+        return X
+
+    def member_margins(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        X32 = X.astype(np.float32).astype(np.float64)
+        margins = {}
+        for name, member in self.members.items():
+            bins = member.bins(X32 if name in FLOAT32_MEMBERS else X)
+            margins[name] = np.empty(len(X))
+            for start in range(0, len(X), CHUNK_ROWS):
+                stop = min(start + CHUNK_ROWS, len(X))
+                margins[name][start:stop] = member.margin(bins, start, stop)
+        return margins
+
+    def member_probas(self, X, timings=None):
+        started = time.perf_counter()
+        probs = {name: _sigmoid(margin) for name, margin in self.member_margins(X).items()}
+        if timings is not None:
+            timings["compiled"] = time.perf_counter() - started
+        return probs
+
+    def proba(self, X, timings=None):
+        # Порядок сложения тот же, что в ensemble.ensemble_proba
+        probs = self.member_probas(X, timings)
+        return (probs["xgb"] + probs["cat"] + probs["lgb"]) / 3
+
+    def save(self, path):
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, **self.arrays)
+        os.replace(tmp, path)
+
+
+def compile_ensemble(imputer, models):
+    # imputer — обученный SimpleImputer(strategy="median"), models — {"xgb", "cat", "lgb"}
+    n_features = len(imputer.statistics_)
+    arrays = {
+        "format_version": np.array(FORMAT_VERSION),
+        "imputer_statistics": np.asarray(imputer.statistics_, dtype=np.float64),
+    }
+    for name, convert in (("xgb", _xgb_trees), ("lgb", _lgb_trees)):
+        trees, base_margin = convert(models[name])
+        splits, leaves, dtype, initial = _leaf_mask_splits(trees)
+        arrays.update(_member_arrays(name, MEMBER_SPLITS[name], splits, leaves, dtype, initial, n_features, base_margin))
+    trees, scale, bias = _cat_trees(models["cat"])
+    splits, leaves, dtype, initial = _oblivious_splits(trees)
+    arrays.update(_member_arrays("cat", MEMBER_SPLITS["cat"], splits, leaves * scale, dtype, initial, n_features, bias))
+    return CompiledEnsemble(arrays)
+
+
+def load_compiled(path):
+    # None, если файла нет или он в прежнем формате
+    file = os.path.join(path, COMPILED)
+    if not os.path.exists(file):
+        return None
+    with np.load(file) as data:
+        arrays = {name: data[name] for name in data.files}
+    if int(arrays["format_version"]) != FORMAT_VERSION:
+        return None
+    return CompiledEnsemble(arrays)
+
+
+if __name__ == "__main__":
+    from registry import compile_artifact
+    path = compile_artifact(sys.argv[1] if len(sys.argv) > 1 else "base", sys.argv[2] if len(sys.argv) > 2 else None)
+    print(f"✅ {path}")
@@ -0,0 +1,191 @@
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from addresses import normalize_address
+
+# === Обогащение адресов внешним сервисом ===
+# Пул асинхронных воркеров с ограничением частоты запросов. Результаты пишутся
+# в SQLite-кэш по нормализованному адресу и фиксируются каждые checkpoint_every
+# ответов: прерванный запуск продолжается с места остановки, а повторные запуски
+# и пересекающиеся наборы данных запрашивают только новые адреса.
+# Источник подключаемый: OsmBackend (osm_business_checker), HttpBackend (любой
+# HTTP-сервис, например локальная заглушка) или StaticBackend (словарь в памяти).
+
+CACHE_PATH = os.environ.get("ELECTRICITY_ENRICH_CACHE", "enrichment_cache.sqlite")
+CONCURRENCY = 4
+RATE = 1.0  # запросов в секунду; публичный Nominatim допускает не больше одного
+CHECKPOINT_EVERY = 50
+RETRIES = 2
+
+
+class OsmBackend:
+    # check_multiple_addresses синхронный, поэтому вызывается в потоке по одному адресу
+    name = "osm"
+
+    def __init__(self):
+        from osm_business_checker import check_multiple_addresses
+        self._check = check_multiple_addresses
+
+    async def lookup(self, address):
+        result = await asyncio.to_thread(self._check, [address])
+        return result.get(address)
+
+
+class HttpBackend:
+    # GET {url}?address=... → JSON-ответ сервиса сохраняется как есть
+    def __init__(self, url, timeout=30.0):
+        import httpx
+        self.name = url
+        self.url = url
+        self.client = httpx.AsyncClient(timeout=timeout)
+
+    async def lookup(self, address):
+        response = await self.client.get(self.url, params={"address": address})
+        response.raise_for_status()
+        return response.json()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+class StaticBackend:
+    # Ответы из словаря с необязательной задержкой — для проверок без сети
+    def __init__(self, results, delay=0.0, default=None, name="static"):
+        self.name = name
+        self.results = results
+        self.delay = delay
+        self.default = default
+
+    async def lookup(self, address):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return self.results.get(address, self.default)
+
+
+def make_backend(spec):
+    # "osm" или URL HTTP-сервиса
+    if spec == "osm":
+        return OsmBackend()
+    if spec.startswith(("http://", "https://")):
+        return HttpBackend(spec)
+    raise ValueError(f"Неизвестный источник обогащения: {spec}")
+
+
+class EnrichmentCache:
+
+    def __init__(self, path=CACHE_PATH):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS lookups ("
+            " backend TEXT NOT NULL, key TEXT NOT NULL, address TEXT NOT NULL,"
+            " result TEXT, fetched_at REAL NOT NULL, PRIMARY KEY (backend, key))"
+        )
+        self.connection.commit()
+        self.pending = []
+
+    def get_many(self, backend, keys):
+        found = {}
+        keys = list(keys)
+        for start in range(0, len(keys), 500):
+            part = keys[start:start + 500]
+            placeholders = ",".join("?" * len(part))
+            rows = self.connection.execute(
+                f"SELECT key, result FROM lookups WHERE backend = ? AND key IN ({placeholders})",
+                [backend, *part])
+            found.update((key, json.loads(result)) for key, result in rows)
+        return found
+
+    def put(self, backend, key, address, result):
+        self.pending.append((backend, key, address, json.dumps(result, ensure_ascii=False), time.time()))
+
+    def checkpoint(self):
+        if self.pending:
+            self.connection.executemany("INSERT OR REPLACE INTO lookups VALUES (?, ?, ?, ?, ?)", self.pending)
+            self.connection.commit()
+            self.pending = []
+
+    def close(self):
+        self.checkpoint()
+        self.connection.close()
+
+
+class RateLimiter:
+    # Не больше rate запусков в секунду по всем воркерам; rate=None — без ограничения
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_at = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self.lock:
+            now = time.monotonic()
+            delay = self.next_at - now
+            self.next_at = max(now, self.next_at) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+async def enrich(addresses, backend, cache, concurrency=CONCURRENCY, rate=RATE,
+                 checkpoint_every=CHECKPOINT_EVERY, retries=RETRIES, key=normalize_address, verbose=True):
+    # Возвращает {адрес: результат}. Адреса с одинаковым key(адрес) запрашиваются один раз
+    # (addresses.building_key — один запрос на здание). Адреса с ошибкой после всех
+    # попыток в результат не попадают и не кэшируются — их запросит следующий запуск
+    by_key = {}
+    for address in addresses:
+        by_key.setdefault(key(address), []).append(address)
+    known = cache.get_many(backend.name, by_key)
+    todo = [lookup_key for lookup_key in by_key if lookup_key not in known]
+    if verbose:
+        print(f"Адресов: {len(by_key)}, из кэша: {len(known)}, запросить: {len(todo)}")
+
+    queue = asyncio.Queue()
+    for lookup_key in todo:
+        queue.put_nowait(lookup_key)
+    limiter = RateLimiter(rate)
+    fetched = {}
+    failed = {}
+    started = time.perf_counter()
+
+    async def worker():
+        while True:
+            try:
+                lookup_key = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            address = by_key[lookup_key][0]
+            for attempt in range(retries + 1):
+                await limiter.wait()
+                try:
+                    result = await backend.lookup(address)
+                except Exception as error:  # сетевые ошибки и ответы сервиса с ошибкой
+                    if attempt == retries:
+                        failed[lookup_key] = repr(error)
+                    continue
+                fetched[lookup_key] = result
+                cache.put(backend.name, lookup_key, address, result)
+                if len(fetched) % checkpoint_every == 0:
+                    cache.checkpoint()
+                    if verbose:
+                        rate_now = len(fetched) / (time.perf_counter() - started)
+                        print(f"Получено {len(fetched)}/{len(todo)} ({rate_now:.1f} адр./с)")
+                break
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    finally:
+        # В том числе при Ctrl+C: уже полученное не теряется
+        cache.checkpoint()
+    if verbose and failed:
+        print(f"Не удалось получить {len(failed)} адресов, они будут запрошены при следующем запуске")
+
+    results = {}
+    for lookup_key, originals in by_key.items():
+        if lookup_key in known or lookup_key in fetched:
+            value = known[lookup_key] if lookup_key in known else fetched[lookup_key]
+            for address in originals:
+                results[address] = value
+    return results
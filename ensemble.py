@@ -0,0 +1,129 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_all_start_methods, get_context
+
+# === Ансамбль XGBoost + CatBoost + LightGBM ===
+# Гиперпараметры общие для mlka.py, ML.py и damnit_json.py.
+# Члены ансамбля независимы, поэтому обучаются и предсказывают в отдельных
+# процессах; ядра делятся между ними через настройку потоков каждой библиотеки.
+# Библиотеки импортируются при первом обучении: скоринг скомпилированной
+# моделью (compiled_trees.py) обходится без них.
+
+MEMBERS = ["xgb", "cat", "lgb"]
+PARALLEL_MIN_ROWS = 50_000
+# Потоки CatBoost при предсказании (-1 — все ядра); меняет set_predict_threads
+_cat_predict_threads = -1
+
+
+def threads_per_member():
+    return max(1, (os.cpu_count() or 1) // len(MEMBERS))
+
+
+def process_context():
+    # forkserver (где его нет — spawn): дочерний процесс не наследует пулы потоков
+    # OpenMP, уже запущенные моделями в родителе — после fork они бы зависли.
+    # Главный модуль импортируется в дочернем процессе заново, поэтому скрипты,
+    # доходящие до пулов процессов, защищены if __name__ == "__main__"
+    return get_context("forkserver" if "forkserver" in get_all_start_methods() else "spawn")
+
+
+def make_model(name, n_threads=None):
+    # n_threads=None — настройка библиотеки по умолчанию (все ядра)
+    if name == "xgb":
+        import xgboost as xgb
+        return xgb.XGBClassifier(max_depth=4, learning_rate=0.1, n_estimators=300,
+                                 subsample=0.6, colsample_bytree=0.8,
+                                 use_label_encoder=False, eval_metric="logloss",
+                                 n_jobs=n_threads)
+    if name == "cat":
+        from catboost import CatBoostClassifier
+        return CatBoostClassifier(iterations=300, depth=4, learning_rate=0.1, verbose=0,
+                                  thread_count=n_threads or -1)
+    if name == "lgb":
+        from lightgbm import LGBMClassifier
+        return LGBMClassifier(n_estimators=300, max_depth=4, learning_rate=0.1, n_jobs=n_threads)
+    raise ValueError(f"Неизвестная модель ансамбля: {name}")
+
+
+def _fit_member(name, X, y, n_threads):
+    start = time.perf_counter()
+    model = make_model(name, n_threads)
+    model.fit(X, y)
+    return model, time.perf_counter() - start
+
+
+def set_predict_threads(models, n_threads):
+    # Для пулов процессов (batch_scoring.py): каждый процесс предсказывает в n_threads
+    # потоков, иначе процессы делят ядра с потоками друг друга
+    global _cat_predict_threads
+    models["xgb"].set_params(n_jobs=n_threads)
+    models["lgb"].set_params(n_jobs=n_threads)
+    _cat_predict_threads = n_threads
+
+
+def _predict_member(name, model, X):
+    start = time.perf_counter()
+    if name == "cat":
+        # predict_proba CatBoost не берёт thread_count из параметров модели
+        proba = model.predict_proba(X, thread_count=_cat_predict_threads)
+    else:
+        proba = model.predict_proba(X)
+    return proba[:, 1], time.perf_counter() - start
+
+
+def _run(fn, jobs, parallel):
+    if not parallel:
+        return [fn(*job) for job in jobs]
+    with ProcessPoolExecutor(len(jobs), mp_context=process_context()) as pool:
+        futures = [pool.submit(fn, *job) for job in jobs]
+        return [future.result() for future in futures]
+
+
+def _report(action, timings, started):
+    members = ", ".join(f"{name} {seconds:.2f} с" for name, seconds in timings.items())
+    print(f"⏱ {action}: {members}; всего {time.perf_counter() - started:.2f} с")
+
+
+def fit_models(X, y, parallel=None, n_threads=None, timings=None, verbose=True):
+    # parallel=None — параллельно, если ядер больше одного.
+    # n_threads=None — threads_per_member() в обоих режимах, чтобы модели
+    # не зависели от того, обучались ли члены параллельно
+    if parallel is None:
+        parallel = (os.cpu_count() or 1) > 1
+    if n_threads is None:
+        n_threads = threads_per_member()
+    started = time.perf_counter()
+    results = _run(_fit_member, [(name, X, y, n_threads) for name in MEMBERS], parallel)
+    models = {}
+    timings = {} if timings is None else timings
+    for name, (model, seconds) in zip(MEMBERS, results):
+        models[name] = model
+        timings[name] = seconds
+    if verbose:
+        _report("обучение", timings, started)
+    return models
+
+
+def member_probas(models, X, parallel=False, timings=None, verbose=False):
+    # parallel=None — параллельно только на больших матрицах:
+    # для небольших батчей запуск процессов дороже самого предсказания
+    if parallel is None:
+        parallel = (os.cpu_count() or 1) > 1 and len(X) >= PARALLEL_MIN_ROWS
+    started = time.perf_counter()
+    results = _run(_predict_member, [(name, models[name], X) for name in MEMBERS], parallel)
+    probs = {}
+    timings = {} if timings is None else timings
+    for name, (proba, seconds) in zip(MEMBERS, results):
+        probs[name] = proba
+        timings[name] = seconds
+    if verbose:
+        _report("предсказание", timings, started)
+    return probs
+
+
+def ensemble_proba(models, X, parallel=False, timings=None, verbose=False):
+    # Среднее вероятностей класса 1 в фиксированном порядке членов —
+    # одинаково при последовательном и параллельном предсказании
+    probs = member_probas(models, X, parallel, timings, verbose)
+    return (probs["xgb"] + probs["cat"] + probs["lgb"]) / 3
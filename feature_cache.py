@@ -0,0 +1,206 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import numpy as np
+from columnar import is_columnar, iter_dataset
+from features import (BASE_COLUMNS, BUILDING_COLUMNS, EXTENDED_COLUMNS, FEATURE_VERSION, buildings_digest,
+                      extract_account_ids, extract_features, extract_targets, update_categories)
+
+# === Кэш матриц признаков ===
+# Разбор JSON и extract_features для обучающего/тестового набора делаются один раз:
+# матрица признаков, метки и accountId пишутся в .feature_cache/<ключ>/ бинарными
+# файлами (как колонки columnar.py) и при попадании открываются через np.memmap.
+# Запись кэша привязана к исходному файлу (размер и mtime, при их расхождении —
+# хэш содержимого), к FEATURE_VERSION и к настройкам признаков (включая отпечаток
+# статистики зданий, если признаки зданий включены). Устаревшие записи
+# удаляются при обращении, а сверх CACHE_MB вытесняются давно не использованные.
+
+CACHE_DIR = os.environ.get("ELECTRICITY_FEATURE_CACHE", ".feature_cache")  # "" — без кэша
+CACHE_MB = float(os.environ.get("ELECTRICITY_FEATURE_CACHE_MB", 4096))
+META_FILE = "meta.json"
+ARRAYS = {"X": "<f4", "y": "i1", "accountId": "<i8"}
+STALE_TMP = 3600  # недописанные каталоги старше часа остались от упавших процессов
+
+
+class FeatureSet:
+    __slots__ = ("X", "y", "account_ids", "columns", "categories")
+
+    def __init__(self, X, y, account_ids, columns, categories):
+        self.X = X
+        self.y = y
+        self.account_ids = account_ids
+        self.columns = columns
+        self.categories = categories
+
+    def __len__(self):
+        return len(self.X)
+
+
+def _source_files(path):
+    if is_columnar(path):
+        return [os.path.join(path, name) for name in sorted(os.listdir(path))]
+    return [path]
+
+
+def source_stat(path):
+    return [[os.path.basename(file), os.path.getsize(file), os.stat(file).st_mtime_ns]
+            for file in _source_files(path)]
+
+
+def source_digest(path):
+    digest = hashlib.sha1()
+    for file in _source_files(path):
+        with open(file, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _settings(path, extended, categories, buildings):
+    return {
+        "source": os.path.abspath(path),
+        "feature_version": FEATURE_VERSION,
+        "extended": bool(extended),
+        "categories": None if categories is None else list(categories),
+        "buildings": buildings_digest(buildings),
+    }
+
+
+def _entry_key(settings):
+    return hashlib.sha1(json.dumps(settings, sort_keys=True, ensure_ascii=False).encode()).hexdigest()[:20]
+
+
+def _read_meta(entry):
+    try:
+        with open(os.path.join(entry, META_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(entry, meta):
+    tmp = os.path.join(entry, META_FILE + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp, os.path.join(entry, META_FILE))
+
+
+def _entry_size(entry):
+    return sum(os.path.getsize(os.path.join(entry, name)) for name in os.listdir(entry))
+
+
+def evict(cache_dir=CACHE_DIR, max_mb=CACHE_MB):
+    # Удаляет записи другой версии признаков, записи без исходного файла и
+    # брошенные недописанные, затем самые давно использованные сверх max_mb
+    if not os.path.isdir(cache_dir):
+        return 0
+    removed = 0
+    alive = []
+    for name in os.listdir(cache_dir):
+        entry = os.path.join(cache_dir, name)
+        if not os.path.isdir(entry):
+            continue
+        if name.endswith(".tmp"):
+            if time.time() - os.path.getmtime(entry) > STALE_TMP:
+                shutil.rmtree(entry, ignore_errors=True)
+            continue
+        meta = _read_meta(entry)
+        if (meta is None or meta["settings"]["feature_version"] != FEATURE_VERSION
+                or not os.path.exists(meta["settings"]["source"])):
+            shutil.rmtree(entry, ignore_errors=True)
+            removed += 1
+        else:
+            alive.append((os.path.getmtime(os.path.join(entry, META_FILE)), _entry_size(entry), entry))
+    total = sum(size for _, size, _ in alive)
+    for _, size, entry in sorted(alive):
+        if total <= max_mb * 2 ** 20:
+            break
+        shutil.rmtree(entry, ignore_errors=True)
+        total -= size
+        removed += 1
+    return removed
+
+
+def _open_entry(entry, meta):
+    count = meta["count"]
+    arrays = {}
+    for name, dtype in ARRAYS.items():
+        shape = (count, len(meta["columns"])) if name == "X" else (count,)
+        if count == 0:
+            arrays[name] = np.empty(shape, dtype=dtype)
+        else:
+            arrays[name] = np.memmap(os.path.join(entry, f"{name}.bin"), dtype=dtype, mode="r", shape=shape)
+    return FeatureSet(arrays["X"], arrays["y"], arrays["accountId"], meta["columns"], meta["categories"])
+
+
+def _lookup(entry, path, settings):
+    # Попадание: тот же размер и mtime или, если они изменились, то же содержимое
+    meta = _read_meta(entry)
+    if meta is None or meta["settings"] != settings:
+        return None
+    stat = source_stat(path)
+    if meta["stat"] != stat:
+        if meta["digest"] != source_digest(path):
+            return None
+        meta["stat"] = stat
+    _write_meta(entry, meta)  # заодно отметка использования для вытеснения
+    return _open_entry(entry, meta)
+
+
+def _build(path, extended, categories, buildings, batch_size):
+    # Потоково, как iter_features: без categories коды копятся по ходу чтения
+    codes = [] if categories is None else list(categories)
+    columns = list(EXTENDED_COLUMNS if extended else BASE_COLUMNS)
+    if buildings is not None:
+        columns += BUILDING_COLUMNS
+    parts = {name: [np.empty((0, len(columns)) if name == "X" else 0, dtype=dtype)]
+             for name, dtype in ARRAYS.items()}
+    for batch in iter_dataset(path, batch_size):
+        if categories is None:
+            update_categories(codes, batch)
+        X, columns = extract_features(batch, extended, codes, buildings)
+        parts["X"].append(X)
+        parts["y"].append(extract_targets(batch))
+        parts["accountId"].append(extract_account_ids(batch))
+    return FeatureSet(*(np.concatenate(parts[name]) for name in ARRAYS), columns, codes)
+
+
+def cached_features(path, extended=False, categories=None, buildings=None, cache_dir=CACHE_DIR,
+                    batch_size=10_000):
+    # Признаки, метки и accountId набора; categories=None — словарь buildingType
+    # строится по самому набору (как при обучении) и возвращается в .categories.
+    # buildings — статистика building_stats(): добавляет BUILDING_COLUMNS
+    if not cache_dir:
+        return _build(path, extended, categories, buildings, batch_size)
+    settings = _settings(path, extended, categories, buildings)
+    entry = os.path.join(cache_dir, _entry_key(settings))
+    if os.path.isdir(entry):
+        found = _lookup(entry, path, settings)
+        if found is not None:
+            return found
+        shutil.rmtree(entry, ignore_errors=True)
+
+    stat = source_stat(path)
+    features = _build(path, extended, categories, buildings, batch_size)
+    # Пишется во временный каталог и переименовывается: недописанная запись не видна
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = f"{entry}.{os.getpid()}.tmp"
+    os.makedirs(tmp, exist_ok=True)
+    for name, values in (("X", features.X), ("y", features.y), ("accountId", features.account_ids)):
+        np.ascontiguousarray(values, dtype=ARRAYS[name]).tofile(os.path.join(tmp, f"{name}.bin"))
+    meta = {
+        "settings": settings,
+        "stat": stat,
+        "digest": source_digest(path),
+        "count": len(features),
+        "columns": features.columns,
+        "categories": features.categories,
+        "created_at": time.time(),
+    }
+    _write_meta(tmp, meta)
+    shutil.rmtree(entry, ignore_errors=True)
+    os.replace(tmp, entry)
+    evict(cache_dir)
+    return _open_entry(entry, meta)
@@ -0,0 +1,272 @@
+import hashlib
+import json
+import numpy as np
+from addresses import building_keys
+from columnar import ColumnarDataset, iter_dataset
+
+# === Общий модуль признаков для ML.py, damnit_json.py, mlka.py и Startscr.py ===
+# Потребители один раз превращаются в матрицу потребления (N×12),
+# после чего все признаки считаются операциями над целыми столбцами.
+# На вход — список записей из JSON или ColumnarDataset (колонки берутся напрямую).
+
+# Версия определения признаков: увеличить при любом изменении extract_features,
+# иначе feature_cache.py отдаст матрицы, посчитанные прежним кодом
+FEATURE_VERSION = 1
+
+MONTH_KEYS = [str(m) for m in range(1, 13)]
+
+SUMMER_MONTHS = [5, 6, 7, 8, 9]
+WINTER_MONTHS = [10, 11, 12, 1, 2, 3, 4]
+# Короткие сезоны расширенного набора (damnit_json.py)
+SUMMER_PEAK_MONTHS = [6, 7, 8]
+WINTER_PEAK_MONTHS = [12, 1, 2]
+# Веса средневзвешенного летнего потребления по месяцам 5..9
+SUMMER_WEIGHTS = [1, 1, 2, 2, 1]
+MONTH_COLUMNS = [1, 2, 3, 4, 10, 11, 12]
+
+BASE_COLUMNS = [
+    "roomsCount", "residentsCount", "totalArea", "buildingType",
+    "summer_mean", "winter_mean_consumption", "std_summer", "std_winter",
+    "zero_month_ratio", "area_per_person", "population_density",
+] + [f"c_{m}" for m in MONTH_COLUMNS]
+
+EXTENDED_COLUMNS = [
+    "roomsCount", "residentsCount", "totalArea", "buildingType",
+    "summer_mean", "summer_sum", "summer_weighted_avg",
+    "winter_mean_consumption", "high_winter_consumption",
+    "consumption_mean", "consumption_std", "consumption_median",
+    "consumption_sum_summer", "consumption_sum_winter",
+    "std_summer", "std_winter", "zero_month_ratio",
+    "area_per_person", "log_area_per_person", "log_totalArea",
+    "population_density",
+] + [f"c_{m}" for m in MONTH_COLUMNS]
+
+
+# Признаки здания (building_key): число счетов и суммарное годовое потребление по адресу.
+# Статистика считается по обучающему набору и хранится в версии модели (registry.py,
+# buildings=True), поэтому при обучении и скоринге признаки берутся из одной таблицы
+BUILDING_COLUMNS = ["building_accounts", "building_consumption"]
+
+
+def _cols(months):
+    return [m - 1 for m in months]
+
+
+def consumption_matrix(data):
+    # Отсутствующие месяцы считаются нулевыми, как и раньше
+    if isinstance(data, ColumnarDataset):
+        return data.consumption.astype(np.float64)
+    flat = [
+        cons.get(key, 0)
+        for entry in data
+        for cons in (entry.get("consumption") or {},)
+        for key in MONTH_KEYS
+    ]
+    return np.asarray(flat, dtype=np.float64).reshape(-1, 12)
+
+
+def building_type_categories(*datasets):
+    # Порядок первого появления — тот же, что даёт pd.factorize на склеенных наборах
+    categories = []
+    for data in datasets:
+        update_categories(categories, data)
+    return categories
+
+
+def _building_type_names(data):
+    if isinstance(data, ColumnarDataset):
+        codes, first = np.unique(data.buildingType, return_index=True)
+        dictionary = data.dictionaries["buildingType"]
+        return [dictionary[c] if c >= 0 else "NA" for c in codes[np.argsort(first)].tolist()]
+    return (entry.get("buildingType", "NA") for entry in data)
+
+
+def update_categories(categories, data):
+    # Дополняет список новыми типами из очередного батча, не меняя старых кодов
+    known = set(categories)
+    for name in _building_type_names(data):
+        if name not in known:
+            known.add(name)
+            categories.append(name)
+    return categories
+
+
+def encode_building_types(data, categories=None):
+    if categories is None:
+        categories = building_type_categories(data)
+    index = {name: code for code, name in enumerate(categories)}
+    if isinstance(data, ColumnarDataset):
+        # Код -1 (нет поля) попадает на последний элемент — "NA"
+        names = data.dictionaries["buildingType"] + ["NA"]
+        lookup = np.array([index.get(name, -1) for name in names], dtype=np.float64)
+        return lookup[data.buildingType]
+    return np.fromiter(
+        (index.get(entry.get("buildingType", "NA"), -1) for entry in data),
+        dtype=np.float64, count=len(data),
+    )
+
+
+def extract_targets(data):
+    if isinstance(data, ColumnarDataset):
+        return (data.isCommercial == 1).astype(np.int8)
+    return np.fromiter((bool(entry.get("isCommercial")) for entry in data), dtype=np.int8, count=len(data))
+
+
+def extract_account_ids(data):
+    if isinstance(data, ColumnarDataset):
+        return data.accountId.astype(np.int64)
+    return np.fromiter((entry.get("accountId") for entry in data), dtype=np.int64, count=len(data))
+
+
+def extract_addresses(data):
+    if isinstance(data, ColumnarDataset):
+        return data.addresses()
+    return [entry.get("address") for entry in data]
+
+
+def building_stats(*datasets):
+    # Один проход по наборам: ключи зданий факторизуются, суммы — через bincount.
+    # Наборы объединяются: счета одного здания могут быть в разных файлах
+    return _building_stats(datasets)
+
+
+def path_building_stats(path, batch_size=10_000):
+    # То же для файла или каталога колоночного формата, батчами
+    return _building_stats(iter_dataset(path, batch_size))
+
+
+def _building_stats(datasets):
+    keys, yearly = [], []
+    for data in datasets:
+        keys.extend(building_keys(extract_addresses(data)))
+        yearly.append(consumption_matrix(data).sum(axis=1))
+    names, codes = np.unique(np.array(keys, dtype=object), return_inverse=True)
+    counts = np.bincount(codes, minlength=len(names))
+    totals = np.bincount(codes, weights=np.concatenate(yearly) if yearly else None, minlength=len(names))
+    return {name: (int(count), float(total)) for name, count, total in zip(names.tolist(), counts, totals)}
+
+
+def buildings_digest(stats):
+    # Отпечаток статистики зданий для ключа feature_cache; None — без признаков зданий
+    if stats is None:
+        return None
+    raw = json.dumps(stats, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def building_features(data, stats=None):
+    # stats=None — статистика по самому набору; здания без адреса — NaN
+    if stats is None:
+        stats = building_stats(data)
+    keys = building_keys(extract_addresses(data))
+    values = np.array([stats.get(key, (np.nan, np.nan)) if key else (np.nan, np.nan) for key in keys],
+                      dtype=np.float64).reshape(-1, 2)
+    return {"building_accounts": values[:, 0], "building_consumption": values[:, 1]}
+
+
+def _numeric_inputs(data):
+    n = len(data)
+    if isinstance(data, ColumnarDataset):
+        rooms = np.maximum(data.roomsCount, 0).astype(np.float64)
+        residents = np.maximum(data.residentsCount, 0).astype(np.float64)
+        area = data.totalArea.astype(np.float64)
+    else:
+        rooms = np.fromiter((entry.get("roomsCount", 0) for entry in data), dtype=np.float64, count=n)
+        residents = np.fromiter((entry.get("residentsCount", 0) for entry in data), dtype=np.float64, count=n)
+        area = np.fromiter((entry.get("totalArea", np.nan) for entry in data), dtype=np.float64, count=n)
+    return rooms, residents, area
+
+
+def input_hashes(data):
+    # Хэш входов модели по каждой записи: комнаты, жильцы, площадь, buildingType
+    # и 12 месяцев — в том виде, в каком их видит extract_features
+    rooms, residents, area = _numeric_inputs(data)
+    matrix = np.column_stack([rooms, residents, area, consumption_matrix(data)]).astype("<f8")
+    matrix[np.isnan(matrix)] = np.nan  # один вид NaN для одинаковых байтов
+    if isinstance(data, ColumnarDataset):
+        names = ["NA" if name is None else name for name in data.decode("buildingType")]
+    else:
+        names = [entry.get("buildingType", "NA") for entry in data]
+    raw = matrix.tobytes()
+    width = matrix.shape[1] * 8
+    return [
+        hashlib.blake2b(raw[i * width:(i + 1) * width] + str(name).encode(), digest_size=16).hexdigest()
+        for i, name in enumerate(names)
+    ]
+
+
+def extract_features(data, extended=False, categories=None, buildings=None):
+    # buildings — результат building_stats(): добавляет BUILDING_COLUMNS в конец
+    n = len(data)
+    rooms, residents, area = _numeric_inputs(data)
+    building = encode_building_types(data, categories)
+    months = consumption_matrix(data)
+
+    summer = months[:, _cols(SUMMER_MONTHS if not extended else SUMMER_PEAK_MONTHS)]
+    winter = months[:, _cols(WINTER_MONTHS if not extended else WINTER_PEAK_MONTHS)]
+
+    # NaN в площади сам даёт NaN в производных признаках
+    area_per_person = area / (residents + 0.1)
+    features = {
+        "roomsCount": rooms,
+        "residentsCount": residents,
+        "totalArea": area,
+        "buildingType": building,
+        "summer_mean": summer.mean(axis=1),
+        "winter_mean_consumption": winter.mean(axis=1),
+        "std_summer": summer.std(axis=1),
+        "std_winter": winter.std(axis=1),
+        "zero_month_ratio": (months == 0).sum(axis=1) / 12,
+        "area_per_person": area_per_person,
+        "population_density": (residents + 0.1) / (area + 0.1),
+    }
+    for m in MONTH_COLUMNS:
+        features[f"c_{m}"] = months[:, m - 1]
+
+    if extended:
+        summer_sum = summer.sum(axis=1)
+        winter_sum = winter.sum(axis=1)
+        features.update({
+            "summer_sum": summer_sum,
+            "summer_weighted_avg": np.average(months[:, _cols(SUMMER_MONTHS)], axis=1, weights=SUMMER_WEIGHTS),
+            "high_winter_consumption": (features["winter_mean_consumption"] > 3000).astype(np.float64),
+            "consumption_mean": months.mean(axis=1),
+            "consumption_std": months.std(axis=1),
+            "consumption_median": np.median(months, axis=1),
+            "consumption_sum_summer": summer_sum,
+            "consumption_sum_winter": winter_sum,
+            "log_area_per_person": np.log1p(area_per_person),
+            "log_totalArea": np.log1p(area),
+        })
+
+    columns = EXTENDED_COLUMNS if extended else BASE_COLUMNS
+    if buildings is not None:
+        features.update(building_features(data, buildings))
+        columns = columns + BUILDING_COLUMNS
+    X = np.empty((n, len(columns)), dtype=np.float32)
+    for j, name in enumerate(columns):
+        X[:, j] = features[name]
+    return X, list(columns)
+
+
+def iter_features(path, batch_size=10_000, extended=False, categories=None):
+    # Потоковый вариант: в памяти одновременно только один батч записей
+    # (JSON, JSON Lines или каталог колоночного формата).
+    # Без categories коды накапливаются по ходу чтения и совпадают
+    # с факторизацией всего файла целиком.
+    running = categories is None
+    if running:
+        categories = []
+    for batch in iter_dataset(path, batch_size):
+        if running:
+            update_categories(categories, batch)
+        X, columns = extract_features(batch, extended, categories)
+        yield batch, X, columns
+
+
+def load_features(path, batch_size=10_000, extended=False, categories=None):
+    columns = EXTENDED_COLUMNS if extended else BASE_COLUMNS
+    parts = [np.empty((0, len(columns)), dtype=np.float32)]
+    for _, X, _ in iter_features(path, batch_size, extended, categories):
+        parts.append(X)
+    return np.concatenate(parts), list(columns)
@@ -0,0 +1,135 @@
+import json
+
+# === Потоковое чтение и запись наборов потребителей ===
+# Файл — либо JSON-массив верхнего уровня (dataset_train.json, data.json, ...),
+# либо JSON Lines (одна запись на строку). Формат определяется по первому символу.
+
+READ_CHUNK = 1 << 20
+_WHITESPACE = " \t\r\n"
+
+_decoder = json.JSONDecoder()
+
+
+def _skip(buffer, pos, chars):
+    while pos < len(buffer) and buffer[pos] in chars:
+        pos += 1
+    return pos
+
+
+def _iter_array(file, buffer, chunk_size):
+    pos = 1  # после "["
+    eof = False
+    while True:
+        pos = _skip(buffer, pos, _WHITESPACE + ",")
+        if pos >= len(buffer):
+            if eof:
+                raise ValueError("Неожиданный конец JSON-массива")
+            more = file.read(chunk_size)
+            eof = not more
+            buffer = buffer[pos:] + more
+            pos = 0
+            continue
+        if buffer[pos] == "]":
+            return
+        try:
+            record, end = _decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            end = None
+        if end is None or (end == len(buffer) and not eof):
+            # Запись обрезана границей чанка — дочитываем
+            more = file.read(chunk_size)
+            eof = not more
+            buffer = buffer[pos:] + more
+            pos = 0
+            continue
+        yield record
+        pos = end
+        if pos > chunk_size:
+            buffer = buffer[pos:]
+            pos = 0
+
+
+def iter_records(path, chunk_size=READ_CHUNK):
+    with open(path, encoding="utf-8") as file:
+        buffer = file.read(chunk_size)
+        start = _skip(buffer, 0, _WHITESPACE + "\ufeff")
+        if buffer[start:start + 1] == "[":
+            yield from _iter_array(file, buffer[start:], chunk_size)
+            return
+        file.seek(0)
+        for line in file:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def iter_batches(path, batch_size=10_000, chunk_size=READ_CHUNK):
+    batch = []
+    for record in iter_records(path, chunk_size):
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def encode_record(record, indent=None, separators=None, lines=False):
+    if lines:
+        return json.dumps(record, ensure_ascii=False)
+    text = json.dumps(record, ensure_ascii=False, indent=indent, separators=separators)
+    if indent is not None:
+        pad = " " * indent
+        text = "\n".join(pad + line for line in text.split("\n"))
+    return text
+
+
+class JsonWriter:
+    # Пишет записи по одной: JSON Lines для *.jsonl, иначе JSON-массив
+    # в том же виде, что и json.dump(..., indent=indent, separators=separators)
+
+    def __init__(self, path, indent=None, separators=None):
+        self.path = path
+        self.indent = indent
+        self.separators = separators
+        self.lines = path.endswith(".jsonl")
+        self.count = 0
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, "w", encoding="utf-8")
+        if not self.lines:
+            self._file.write("[")
+        return self
+
+    def encode(self, record):
+        # Текст записи в раскладке файла; writer.write_encoded() вставляет его с разделителями.
+        # Кодировать можно в другом процессе (batch_scoring.py), писать — здесь
+        return encode_record(record, self.indent, self.separators, self.lines)
+
+    def write(self, record):
+        self.write_encoded(self.encode(record))
+
+    def write_encoded(self, text):
+        if self.lines:
+            self._file.write(text)
+            self._file.write("\n")
+        else:
+            if self.indent is None:
+                item_separator = self.separators[0] if self.separators else ", "
+                self._file.write(item_separator if self.count else "")
+            else:
+                self._file.write(",\n" if self.count else "\n")
+            self._file.write(text)
+        self.count += 1
+
+    def write_many(self, records):
+        for record in records:
+            self.write(record)
+
+    def __exit__(self, *exc):
+        if not self.lines:
+            self._file.write("\n]" if self.indent is not None and self.count else "]")
+        self._file.close()
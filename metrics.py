@@ -0,0 +1,310 @@
+import atexit
+import contextvars
+import cProfile
+import os
+import pstats
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# === Инструментирование конвейера и API ===
+# stage(name) — таймер и счётчики памяти вокруг этапа (загрузка, признаки, импутация,
+# обучение/предсказание по моделям, подбор порога, запись, загрузка в БД);
+# счётчики копятся на процесс. Запросы FastAPI учитывает middleware в BAckend2.py:
+# длительность, число и время запросов к БД по эндпоинту. /metrics отдаёт всё
+# в текстовом формате Prometheus. cProfile включается на прогон скрипта
+# (ELECTRICITY_PROFILE=1) или на отдельный запрос (ELECTRICITY_PROFILE_REQUESTS=1
+# и заголовок X-Profile: 1); профили пишутся в PROFILE_DIR.
+
+STAGE_LOG = os.environ.get("ELECTRICITY_STAGE_LOG", "0") == "1"  # строка на каждый этап в stderr
+PROFILE = os.environ.get("ELECTRICITY_PROFILE", "0") == "1"
+PROFILE_REQUESTS = os.environ.get("ELECTRICITY_PROFILE_REQUESTS", "0") == "1"
+PROFILE_DIR = os.environ.get("ELECTRICITY_PROFILE_DIR", "profiles")
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_METHODS = ("execute_query", "execute_query_dict", "execute_insert", "execute_many", "execute_script")
+
+_lock = threading.Lock()
+_stages = {}
+_requests = {}
+_db_totals = [0, 0.0]
+# Счётчик запросов к БД текущего HTTP-запроса (list [число, секунды]) и флаг вложенного вызова
+_db_current = contextvars.ContextVar("db_current", default=None)
+_db_nested = contextvars.ContextVar("db_nested", default=False)
+
+
+def rss_mb():
+    # Текущий RSS (Linux); на других системах — пиковый
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError):
+        return peak_rss_mb()
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 1024
+
+
+def record_stage(name, seconds, rss_delta=0.0):
+    with _lock:
+        stats = _stages.setdefault(name, {"runs": 0, "seconds": 0.0, "max_seconds": 0.0, "rss_delta_mb": 0.0})
+        stats["runs"] += 1
+        stats["seconds"] += seconds
+        stats["max_seconds"] = max(stats["max_seconds"], seconds)
+        stats["rss_delta_mb"] += rss_delta
+    if STAGE_LOG:
+        print(f"⏱ {name}: {seconds:.3f} с, RSS {rss_delta:+.1f} МБ (пик {peak_rss_mb():.0f} МБ)", file=sys.stderr)
+
+
+@contextmanager
+def stage(name):
+    rss_before = rss_mb()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - started, rss_mb() - rss_before)
+
+
+def record_member_timings(action, timings):
+    # timings из ensemble.fit_models / member_probas: {"xgb": секунды, ...}
+    for name, seconds in timings.items():
+        record_stage(f"{action}:{name}", seconds)
+
+
+def stage_stats():
+    with _lock:
+        return {name: dict(stats) for name, stats in _stages.items()}
+
+
+def report(file=sys.stderr):
+    stats = stage_stats()
+    if not stats:
+        return
+    print(f"=== Этапы (пик RSS {peak_rss_mb():.0f} МБ) ===", file=file)
+    for name, item in sorted(stats.items(), key=lambda kv: -kv[1]["seconds"]):
+        print(f"{name:>24}: {item['seconds']:8.3f} с за {item['runs']} раз, "
+              f"макс {item['max_seconds']:.3f} с, RSS {item['rss_delta_mb']:+.1f} МБ", file=file)
+
+
+# --- Запросы к БД ---
+
+def _counted(method):
+    async def wrapper(*args, **kwargs):
+        if _db_nested.get():
+            return await method(*args, **kwargs)
+        token = _db_nested.set(True)
+        started = time.perf_counter()
+        try:
+            return await method(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - started
+            _db_nested.reset(token)
+            current = _db_current.get()
+            if current is not None:
+                current[0] += 1
+                current[1] += seconds
+            with _lock:
+                _db_totals[0] += 1
+                _db_totals[1] += seconds
+    wrapper.counted = True
+    return wrapper
+
+
+def _subclasses(cls):
+    for sub in cls.__subclasses__():
+        yield sub
+        yield from _subclasses(sub)
+
+
+_instrumented = set()
+
+
+def instrument_db():
+    # Обёртки над execute_* всех клиентов Tortoise (включая транзакционные). Классы
+    # клиентов импортируются при Tortoise.init, поэтому вызов повторяется на каждом
+    # запросе и обрабатывает только ещё не обёрнутые классы
+    from tortoise.backends.base.client import BaseDBAsyncClient
+    for cls in [BaseDBAsyncClient, *_subclasses(BaseDBAsyncClient)]:
+        if cls in _instrumented:
+            continue
+        _instrumented.add(cls)
+        for name in DB_METHODS:
+            method = cls.__dict__.get(name)
+            if method is not None and not getattr(method, "counted", False):
+                setattr(cls, name, _counted(method))
+
+
+def start_db_counter():
+    counter = [0, 0.0]
+    return counter, _db_current.set(counter)
+
+
+def stop_db_counter(token):
+    _db_current.reset(token)
+
+
+# --- HTTP ---
+
+def record_request(method, route, status, seconds, db_queries, db_seconds):
+    with _lock:
+        stats = _requests.get((method, route))
+        if stats is None:
+            stats = _requests[(method, route)] = {
+                "statuses": {}, "seconds": 0.0, "buckets": [0] * len(LATENCY_BUCKETS),
+                "db_queries": 0, "db_seconds": 0.0,
+            }
+        stats["statuses"][status] = stats["statuses"].get(status, 0) + 1
+        stats["seconds"] += seconds
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                stats["buckets"][i] += 1
+        stats["db_queries"] += db_queries
+        stats["db_seconds"] += db_seconds
+
+
+class RequestMetricsMiddleware:
+    # ASGI-middleware: длительность, статус и запросы к БД по шаблону маршрута
+    # (/dashboard/{account_id}, а не конкретный id). В ответ добавляется Server-Timing
+    # с длительностью до заголовков ответа и временем в БД
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        instrument_db()
+        counter, token = start_db_counter()
+        started = time.perf_counter()
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                elapsed = (time.perf_counter() - started) * 1000
+                timing = f'app;dur={elapsed:.1f}, db;dur={counter[1] * 1000:.1f};desc="{counter[0]} queries"'
+                message = {**message, "headers": [*message.get("headers", []), (b"server-timing", timing.encode())]}
+            await send(message)
+
+        profile = PROFILE_REQUESTS and (b"x-profile", b"1") in scope.get("headers", [])
+        try:
+            with profiled(f"{scope['method']} {scope['path']}", enabled=profile):
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            stop_db_counter(token)
+            route = scope.get("route")
+            record_request(scope["method"], getattr(route, "path", "unmatched"), status[0],
+                           time.perf_counter() - started, counter[0], counter[1])
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def render_prometheus(gauges=None):
+    # gauges: {имя: значение} — дополнительные показатели (кэш ответов, /score)
+    lines = []
+
+    def family(name, kind, help_text):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    with _lock:
+        requests = {key: {**value, "statuses": dict(value["statuses"]), "buckets": list(value["buckets"])}
+                    for key, value in _requests.items()}
+        stages = {name: dict(stats) for name, stats in _stages.items()}
+        db_queries, db_seconds = _db_totals
+
+    family("electricity_http_requests_total", "counter", "HTTP requests by route and status")
+    for (method, route), stats in sorted(requests.items()):
+        for status, count in sorted(stats["statuses"].items()):
+            lines.append(f"electricity_http_requests_total{_labels(method=method, route=route, status=status)} {count}")
+    family("electricity_http_request_duration_seconds", "histogram", "HTTP request latency")
+    for (method, route), stats in sorted(requests.items()):
+        total = sum(stats["statuses"].values())
+        for bound, count in zip(LATENCY_BUCKETS, stats["buckets"]):
+            lines.append(f"electricity_http_request_duration_seconds_bucket"
+                         f"{_labels(method=method, route=route, le=bound)} {count}")
+        lines.append(f"electricity_http_request_duration_seconds_bucket{_labels(method=method, route=route, le='+Inf')} {total}")
+        lines.append(f"electricity_http_request_duration_seconds_sum{_labels(method=method, route=route)} {stats['seconds']}")
+        lines.append(f"electricity_http_request_duration_seconds_count{_labels(method=method, route=route)} {total}")
+    family("electricity_http_db_queries_total", "counter", "DB queries issued while serving a route")
+    for (method, route), stats in sorted(requests.items()):
+        lines.append(f"electricity_http_db_queries_total{_labels(method=method, route=route)} {stats['db_queries']}")
+    family("electricity_http_db_seconds_total", "counter", "Time spent in DB queries while serving a route")
+    for (method, route), stats in sorted(requests.items()):
+        lines.append(f"electricity_http_db_seconds_total{_labels(method=method, route=route)} {stats['db_seconds']}")
+    family("electricity_db_queries_total", "counter", "All DB queries of the process")
+    lines.append(f"electricity_db_queries_total {db_queries}")
+    family("electricity_db_seconds_total", "counter", "Time spent in all DB queries of the process")
+    lines.append(f"electricity_db_seconds_total {db_seconds}")
+    family("electricity_stage_runs_total", "counter", "Runs of instrumented stages")
+    for name, stats in sorted(stages.items()):
+        lines.append(f"electricity_stage_runs_total{_labels(stage=name)} {stats['runs']}")
+    family("electricity_stage_seconds_total", "counter", "Time spent in instrumented stages")
+    for name, stats in sorted(stages.items()):
+        lines.append(f"electricity_stage_seconds_total{_labels(stage=name)} {stats['seconds']}")
+    family("electricity_process_resident_memory_bytes", "gauge", "Resident memory of the process")
+    lines.append(f"electricity_process_resident_memory_bytes {int(rss_mb() * 2 ** 20)}")
+    for name, value in (gauges or {}).items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        family(name, "gauge", name.replace("_", " "))
+        lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# --- cProfile ---
+
+def _profile_path(name):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in name).strip("_") or "run"
+    return os.path.join(PROFILE_DIR, f"{safe}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.prof")
+
+
+def save_profile(profiler, name, top=25, file=sys.stderr):
+    # .prof открывается snakeviz/pstats; первые top функций по суммарному времени — сразу в лог
+    path = _profile_path(name)
+    profiler.dump_stats(path)
+    if top:
+        print(f"🔬 Профиль {name}: {path}", file=file)
+        pstats.Stats(profiler, stream=file).sort_stats("cumulative").print_stats(top)
+    return path
+
+
+@contextmanager
+def profiled(name, enabled=True, top=25):
+    if not enabled:
+        yield None
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        save_profile(profiler, name, top)
+
+
+def begin_run(name):
+    # Для скриптов конвейера: в конце прогона — сводка этапов в stderr,
+    # при ELECTRICITY_PROFILE=1 — профиль всего прогона
+    profiler = None
+    if PROFILE:
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    def finish():
+        if profiler is not None:
+            profiler.disable()
+            save_profile(profiler, name)
+        report()
+
+    atexit.register(finish)
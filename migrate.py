@@ -0,0 +1,148 @@
+from tortoise import run_async
+from tortoise import Tortoise
+from convert import init_db
+import Backend1
+from stats import rebuild_summary
+from Backend1 import DERIVED_FIELDS, ElectricityConsumer, MonthlyConsumption, bump_data_version, pack_consumption
+
+# === Миграция существующей БД ===
+# generate_schemas создаёт только отсутствующие таблицы, поэтому новые столбцы
+# моделей добавляются здесь через ALTER TABLE, составные индексы из Meta.indexes —
+# через CREATE INDEX (если индекса с таким именем ещё нет), после чего заполняются производные поля,
+# а при ELECTRICITY_CONSUMPTION_STORAGE=packed — consumption_packed из MonthlyConsumption;
+# агрегаты /stats пересчитываются целиком.
+# Запуск: python migrate.py (БД — как в convert.py, ELECTRICITY_DB_URL)
+
+BACKFILL_CHUNK = 5000
+
+
+async def existing_columns(connection, table):
+    dialect = connection.capabilities.dialect
+    if dialect == "sqlite":
+        rows = await connection.execute_query_dict(f'PRAGMA table_info("{table}")')
+        return {row["name"] for row in rows}
+    if dialect == "mysql":
+        rows = await connection.execute_query_dict(f"SHOW COLUMNS FROM `{table}`")
+        return {row["Field"] for row in rows}
+    rows = await connection.execute_query_dict(
+        "SELECT column_name FROM information_schema.columns WHERE table_name = $1", [table])
+    return {row["column_name"] for row in rows}
+
+
+async def existing_indexes(connection, table):
+    dialect = connection.capabilities.dialect
+    if dialect == "sqlite":
+        rows = await connection.execute_query_dict(f'PRAGMA index_list("{table}")')
+        return {row["name"] for row in rows}
+    if dialect == "mysql":
+        rows = await connection.execute_query_dict(f"SHOW INDEX FROM `{table}`")
+        return {row["Key_name"] for row in rows}
+    rows = await connection.execute_query_dict(
+        "SELECT indexname FROM pg_indexes WHERE tablename = $1", [table])
+    return {row["indexname"] for row in rows}
+
+
+async def add_missing_columns(model):
+    # Добавляются только nullable-столбцы: заполнить существующие строки нечем
+    meta = model._meta
+    connection = meta.db
+    dialect = connection.capabilities.dialect
+    quote = "`" if dialect == "mysql" else '"'
+    table = meta.db_table
+    present = await existing_columns(connection, table)
+    added = []
+    for name, field in meta.fields_map.items():
+        if name not in meta.db_fields:
+            continue
+        column = field.source_field or name
+        if column in present:
+            continue
+        if not field.null:
+            raise RuntimeError(f"{table}.{column}: NOT NULL столбец нельзя добавить миграцией")
+        sql_type = field.get_for_dialect(dialect, "SQL_TYPE")
+        await connection.execute_script(
+            f"ALTER TABLE {quote}{table}{quote} ADD COLUMN {quote}{column}{quote} {sql_type} NULL")
+        if field.index:
+            await connection.execute_script(
+                f"CREATE INDEX {quote}idx_{table}_{column}{quote} ON {quote}{table}{quote} ({quote}{column}{quote})")
+        added.append(column)
+    return added
+
+
+async def add_missing_indexes(model):
+    # Имя индекса — то же, что даёт generate_schemas, поэтому повторный запуск
+    # и новые таблицы (где индекс уже создан вместе с таблицей) ничего не меняют
+    meta = model._meta
+    connection = meta.db
+    quote = "`" if connection.capabilities.dialect == "mysql" else '"'
+    table = meta.db_table
+    generator = connection.schema_generator(connection)
+    present = await existing_indexes(connection, table)
+    added = []
+    for index in meta.indexes:
+        columns = [meta.fields_map[name].source_field or name for name in index]
+        name = generator._get_index_name("idx", model, columns)
+        if name in present:
+            continue
+        fields = ", ".join(f"{quote}{column}{quote}" for column in columns)
+        await connection.execute_script(f"CREATE INDEX {quote}{name}{quote} ON {quote}{table}{quote} ({fields})")
+        added.append(name)
+    return added
+
+
+async def backfill_derived(chunk_size=BACKFILL_CHUNK):
+    # Строки без title загружены до появления производных полей
+    done = 0
+    while True:
+        consumers = await ElectricityConsumer.filter(title__isnull=True).order_by("account_id").limit(chunk_size)
+        if not consumers:
+            return done
+        for consumer in consumers:
+            consumer.fill_derived()
+        await ElectricityConsumer.bulk_update(consumers, fields=list(DERIVED_FIELDS))
+        done += len(consumers)
+        print(f"Заполнено производных полей: {done}")
+
+
+async def pack_monthly_rows(chunk_size=BACKFILL_CHUNK):
+    # Перенос MonthlyConsumption в consumption_packed (режим packed); строки
+    # MonthlyConsumption не удаляются, чтобы можно было вернуться к режиму rows
+    done = 0
+    last = None
+    while True:
+        query = ElectricityConsumer.all().order_by("account_id").limit(chunk_size)
+        if last is not None:
+            query = query.filter(account_id__gt=last)
+        consumers = await query
+        if not consumers:
+            return done
+        last = consumers[-1].account_id
+        rows = await MonthlyConsumption.filter(account_id__in=[c.account_id for c in consumers]) \
+            .values_list("account_id", "month", "value")
+        values = {}
+        for account_id, month, value in rows:
+            values.setdefault(account_id, {})[month] = value
+        for consumer in consumers:
+            consumer.consumption_packed = pack_consumption(values[consumer.account_id]) \
+                if consumer.account_id in values else None
+        await ElectricityConsumer.bulk_update(consumers, fields=["consumption_packed"])
+        done += len(consumers)
+        print(f"Упаковано потребление: {done}")
+
+
+async def main():
+    await init_db()
+    added = await add_missing_columns(ElectricityConsumer)
+    print(f"Добавлены столбцы: {', '.join(added) or 'нет'}")
+    indexes = await add_missing_indexes(ElectricityConsumer)
+    print(f"Добавлены индексы: {', '.join(indexes) or 'нет'}")
+    await backfill_derived()
+    if Backend1.CONSUMPTION_STORAGE == "packed":
+        await pack_monthly_rows()
+    # Агрегаты /stats для данных, загруженных до появления ConsumerSummary
+    await rebuild_summary()
+    await bump_data_version()
+    await Tortoise.close_connections()
+
+if __name__ == '__main__':
+    run_async(main())
@@ -1,7 +1,15 @@
-
+import asyncio
 import json
+import os
 import pandas as pd
-from osm_business_checker import check_multiple_addresses
+from addresses import building_key
+from enrichment import CONCURRENCY, RATE, EnrichmentCache, enrich, make_backend
+
+# === Настройки обогащения ===
+# Источник: "osm" (osm_business_checker) или URL HTTP-сервиса, например локальной заглушки
+BACKEND = os.environ.get("ELECTRICITY_ENRICH_BACKEND", "osm")
+CONCURRENCY = int(os.environ.get("ELECTRICITY_ENRICH_CONCURRENCY", CONCURRENCY))
+RATE = float(os.environ.get("ELECTRICITY_ENRICH_RATE", RATE))
 
 # === Загрузка исходных данных ===
 with open("dataset_train.json", encoding="utf-8") as f:
@@ -13,11 +21,25 @@ df = pd.DataFrame(dataset)
 # === Получение списка адресов
 addresses = df["address"].dropna().unique().tolist()
 
-# === Проверка через OSM
-print(f"🔍 Проверка {len(addresses)} уникальных адресов через OpenStreetMap...")
-address_results = check_multiple_addresses(addresses)
+# === Проверка через внешний сервис: один запрос на здание (варианты написания
+# адреса и квартиры одного дома совпадают по building_key), уже проверенные
+# здания берутся из кэша, прерванный запуск продолжается с последней контрольной точки
+print(f"🔍 Проверка {len(addresses)} уникальных адресов ({BACKEND}, {CONCURRENCY} потоков, {RATE} запр./с)...")
+
+
+async def run():
+    backend = make_backend(BACKEND)
+    cache = EnrichmentCache()
+    try:
+        return await enrich(addresses, backend, cache, concurrency=CONCURRENCY, rate=RATE, key=building_key)
+    finally:
+        cache.close()
+        if hasattr(backend, "aclose"):
+            await backend.aclose()
+
+address_results = asyncio.run(run())
 
-# === Присвоение результата к DataFrame
+# === Присвоение результата к DataFrame (адреса без ответа — NaN)
 df["has_business"] = df["address"].map(address_results)
 
 # === Сохранение обновлённого файла
@@ -0,0 +1,33 @@
+import numpy as np
+from jsonstream import JsonWriter
+from metrics import stage
+
+# === Слияние предсказаний с исходными записями ===
+# Линейно: по позиции (предсказания в порядке записей) или через индекс accountId.
+
+
+def attach_predictions(records, proba, labels, account_ids=None):
+    # account_ids=None — proba[i] относится к records[i]
+    if account_ids is None:
+        positions = range(len(records))
+    else:
+        index = {record["accountId"]: i for i, record in enumerate(records)}
+        positions = [index[int(account_id)] for account_id in account_ids]
+    for i, p, label in zip(positions, np.asarray(proba).tolist(), np.asarray(labels).tolist()):
+        records[i]["isCommercial"] = bool(label)
+        records[i]["probability_isCommercial"] = p
+    return records
+
+
+def sorted_order(proba):
+    # По убыванию вероятности; при равенстве сохраняется исходный порядок, как у sorted()
+    return np.argsort(-np.asarray(proba, dtype=np.float64), kind="stable")
+
+
+@stage("write-back")
+def write_sorted_predictions(records, proba, path, indent=2):
+    # Записи пишутся по одной в порядке сортировки, без отсортированной копии списка
+    with JsonWriter(path, indent=indent) as writer:
+        for i in sorted_order(proba).tolist():
+            writer.write(records[i])
+    return writer.count
@@ -0,0 +1,262 @@
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import joblib
+import numpy as np
+from columnar import is_columnar
+from compiled_trees import COMPILED, compile_ensemble, load_compiled
+from ensemble import MEMBERS, ensemble_proba, fit_models
+from feature_cache import cached_features
+from features import BASE_COLUMNS, BUILDING_COLUMNS, EXTENDED_COLUMNS, extract_features, path_building_stats
+from metrics import record_member_timings, stage
+
+# === Реестр моделей ===
+# Версия модели — каталог models/<name>/<version>/ с manifest.json
+# (категории buildingType, список признаков, порог, отпечаток обучающих данных),
+# импутером и тремя моделями ансамбля. models/<name>/LATEST указывает на последнюю.
+# bundle.pkl — всё то же одним файлом для быстрого холодного старта.
+# compiled.npz — импутер и деревья ансамбля в массивах NumPy (compiled_trees.py):
+# при COMPILED_MODELS скоринг загружает только его, без sklearn и библиотек бустинга.
+# buildings.json — статистика зданий обучающего набора (features.building_stats) для
+# версий с признаками зданий: по ней считаются BUILDING_COLUMNS и при обучении, и при скоринге.
+
+REGISTRY_DIR = "models"
+MANIFEST = "manifest.json"
+BUNDLE = "bundle.pkl"
+LATEST = "LATEST"
+BUILDINGS = "buildings.json"
+COMPILED_MODELS = os.environ.get("ELECTRICITY_COMPILED_MODELS", "1") != "0"
+# Признаки зданий (BUILDING_COLUMNS) в новых версиях по умолчанию
+BUILDING_FEATURES = os.environ.get("ELECTRICITY_BUILDING_FEATURES", "0") != "0"
+
+# Уже загруженные версии процесса: повторная загрузка бесплатна
+_loaded = {}
+
+
+class ModelArtifact:
+
+    def __init__(self, name, categories, feature_columns, imputer, models,
+                 extended=False, threshold=0.5, fingerprint=None, version=None, compiled=None,
+                 buildings=None):
+        self.name = name
+        self.version = version
+        self.categories = list(categories)
+        self.feature_columns = list(feature_columns)
+        self.extended = extended
+        self.threshold = threshold
+        self.fingerprint = fingerprint
+        self.imputer = imputer
+        self.models = models
+        # Скомпилированный ансамбль; у загруженной только из compiled.npz версии
+        # imputer и models — None
+        self.compiled = compiled
+        # Статистика зданий обучающего набора; None — версия без признаков зданий
+        self.buildings = buildings
+
+    def transform(self, batch):
+        # Кодирование по словарю обучения: коды не зависят от состава батча,
+        # незнакомый buildingType получает -1
+        with stage("featurize"):
+            X, columns = extract_features(batch, self.extended, self.categories, self.buildings)
+        return self.impute(X, columns)
+
+    def impute(self, X, columns):
+        if list(columns) != self.feature_columns:
+            raise ValueError(f"Признаки {self.name}/{self.version} не совпадают с текущими")
+        with stage("impute"):
+            if self.imputer is None:
+                return self.compiled.impute(X)
+            return self.imputer.transform(X)
+
+    def _predict(self, X, parallel, verbose):
+        timings = {}
+        if self.models is None:
+            proba = self.compiled.proba(X, timings)
+        else:
+            proba = ensemble_proba(self.models, X, parallel, timings, verbose)
+        record_member_timings("predict", timings)
+        return proba
+
+    def score(self, batch, parallel=False, verbose=False):
+        return self._predict(self.transform(batch), parallel, verbose)
+
+    def features(self, path):
+        # Признаки набора по словарю модели из feature_cache
+        with stage("load+featurize"):
+            return cached_features(path, self.extended, self.categories, self.buildings)
+
+    def score_features(self, features, parallel=False, verbose=False):
+        return self._predict(self.impute(features.X, features.columns), parallel, verbose)
+
+    def predict(self, batch, parallel=False):
+        return self.score(batch, parallel) > self.threshold
+
+    def manifest(self):
+        return {
+            "name": self.name,
+            "version": self.version,
+            "categories": self.categories,
+            "feature_columns": self.feature_columns,
+            "extended": self.extended,
+            "buildings": self.buildings is not None,
+            "threshold": self.threshold,
+            "fingerprint": self.fingerprint,
+            "members": MEMBERS,
+        }
+
+    def save(self, root=REGISTRY_DIR):
+        if self.version is None:
+            suffix = (self.fingerprint or "")[:8]
+            self.version = time.strftime("%Y%m%d-%H%M%S") + (f"-{suffix}" if suffix else "")
+        path = os.path.join(root, self.name, self.version)
+        os.makedirs(path, exist_ok=True)
+        joblib.dump(self.imputer, os.path.join(path, "imputer.pkl"))
+        for name in MEMBERS:
+            joblib.dump(self.models[name], os.path.join(path, f"{name}_model.pkl"))
+        joblib.dump((self.imputer, self.models), os.path.join(path, BUNDLE))
+        if self.compiled is None:
+            self.compiled = compile_ensemble(self.imputer, self.models)
+        self.compiled.save(os.path.join(path, COMPILED))
+        if self.buildings is not None:
+            with open(os.path.join(path, BUILDINGS), "w", encoding="utf-8") as f:
+                json.dump(self.buildings, f, ensure_ascii=False)
+        with open(os.path.join(path, MANIFEST), "w", encoding="utf-8") as f:
+            json.dump(self.manifest(), f, ensure_ascii=False, indent=2)
+        with open(os.path.join(root, self.name, LATEST), "w", encoding="utf-8") as f:
+            f.write(self.version)
+        _loaded[os.path.abspath(path), False] = self
+        return path
+
+    def save_threshold(self, threshold, root=REGISTRY_DIR):
+        # Порог, подобранный на размеченном тесте после обучения (damnit_json.py, ML.py):
+        # пишется в manifest.json этой версии, predict, /score, Startscr.py,
+        # batch_scoring.py и rescore.py берут его оттуда
+        path = os.path.abspath(os.path.join(root, self.name, self.version))
+        manifest = _read_manifest(path)
+        manifest["threshold"] = float(threshold)
+        tmp = os.path.join(path, MANIFEST + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, os.path.join(path, MANIFEST))
+        for key in ((path, False), (path, True)):
+            if key in _loaded:
+                _loaded[key].threshold = float(threshold)
+        self.threshold = float(threshold)
+
+
+def _read_manifest(path):
+    with open(os.path.join(path, MANIFEST), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _load_parts(path):
+    bundle = os.path.join(path, BUNDLE)
+    if os.path.exists(bundle):
+        return joblib.load(bundle)
+    # Без bundle.pkl файлы моделей читаются параллельно
+    files = ["imputer"] + [f"{name}_model" for name in MEMBERS]
+    with ThreadPoolExecutor(len(files)) as pool:
+        parts = list(pool.map(lambda f: joblib.load(os.path.join(path, f"{f}.pkl")), files))
+    return parts[0], dict(zip(MEMBERS, parts[1:]))
+
+
+def latest_version(name, root=REGISTRY_DIR):
+    with open(os.path.join(root, name, LATEST), encoding="utf-8") as f:
+        return f.read().strip()
+
+
+def load_artifact(name, version=None, root=REGISTRY_DIR, compiled=COMPILED_MODELS):
+    # compiled=True — только compiled.npz, если он есть (иначе обычная загрузка);
+    # обученную в этом процессе версию save() уже положил в _loaded целиком
+    if version is None:
+        version = latest_version(name, root)
+    path = os.path.abspath(os.path.join(root, name, version))
+    for key in ((path, False), (path, True)) if compiled else ((path, False),):
+        if key in _loaded:
+            return _loaded[key]
+    manifest = _read_manifest(path)
+    ensemble = load_compiled(path) if compiled else None
+    if ensemble is not None:
+        imputer, models = None, None
+    else:
+        imputer, models = _load_parts(path)
+    buildings = None
+    if manifest.get("buildings"):
+        with open(os.path.join(path, BUILDINGS), encoding="utf-8") as f:
+            buildings = json.load(f)
+    artifact = ModelArtifact(
+        manifest["name"], manifest["categories"], manifest["feature_columns"], imputer, models,
+        extended=manifest["extended"], threshold=manifest["threshold"],
+        fingerprint=manifest["fingerprint"], version=manifest["version"], compiled=ensemble,
+        buildings=buildings,
+    )
+    _loaded[path, ensemble is not None] = artifact
+    return artifact
+
+
+def compile_artifact(name, version=None, root=REGISTRY_DIR):
+    # Экспорт compiled.npz для версии, обученной до compiled_trees.py
+    artifact = load_artifact(name, version, root, compiled=False)
+    path = os.path.join(root, name, artifact.version, COMPILED)
+    compile_ensemble(artifact.imputer, artifact.models).save(path)
+    return path
+
+
+def find_artifact(name, fingerprint, root=REGISTRY_DIR):
+    # Последняя версия, обученная на тех же данных с теми же настройками
+    directory = os.path.join(root, name)
+    if not os.path.isdir(directory):
+        return None
+    for version in sorted(os.listdir(directory), reverse=True):
+        path = os.path.join(directory, version)
+        if os.path.isfile(os.path.join(path, MANIFEST)) and _read_manifest(path)["fingerprint"] == fingerprint:
+            return load_artifact(name, version, root)
+    return None
+
+
+def data_fingerprint(*paths, **settings):
+    digest = hashlib.sha1(json.dumps(settings, sort_keys=True).encode())
+    for path in paths:
+        files = [path]
+        if is_columnar(path):
+            files = [os.path.join(path, f) for f in sorted(os.listdir(path))]
+        for file in files:
+            with open(file, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+    return digest.hexdigest()
+
+
+def train_artifact(name, train_path, extended=False, threshold=0.5, reuse=True, root=REGISTRY_DIR,
+                   buildings=BUILDING_FEATURES):
+    # reuse=True: если версия на тех же данных уже есть, она загружается без переобучения.
+    # buildings=True — признаки зданий по статистике train_path (сохраняется в версии)
+    columns = (EXTENDED_COLUMNS if extended else BASE_COLUMNS) + (BUILDING_COLUMNS if buildings else [])
+    fingerprint = data_fingerprint(train_path, extended=extended, columns=columns, members=MEMBERS)
+    if reuse:
+        artifact = find_artifact(name, fingerprint, root)
+        if artifact is not None:
+            return artifact
+
+    stats = None
+    if buildings:
+        with stage("building stats"):
+            stats = path_building_stats(train_path)
+    # Разбор набора и признаки — из feature_cache, если train_path не менялся
+    with stage("load+featurize"):
+        features = cached_features(train_path, extended, buildings=stats)
+
+    from sklearn.impute import SimpleImputer
+    imputer = SimpleImputer(strategy="median")
+    with stage("impute"):
+        X = imputer.fit_transform(features.X)
+    timings = {}
+    models = fit_models(X, np.asarray(features.y), timings=timings)
+    record_member_timings("fit", timings)
+
+    artifact = ModelArtifact(name, features.categories, features.columns, imputer, models,
+                             extended=extended, threshold=threshold, fingerprint=fingerprint, buildings=stats)
+    artifact.save(root)
+    return artifact
@@ -0,0 +1,80 @@
+import os
+import sys
+import time
+from tortoise import Tortoise, run_async
+from Backend1 import ElectricityConsumer
+from columnar import ColumnarDataset, iter_dataset
+from convert import init_db, insert_chunk
+from features import input_hashes
+from metrics import begin_run
+from predictions import attach_predictions
+from registry import load_artifact
+
+# === Инкрементальный пересчёт вероятностей ===
+# Рядом с is_commercial_prob хранится хэш входов модели (комнаты, жильцы, площадь,
+# buildingType, 12 месяцев) и версия модели. Потребители, у которых совпали и хэш,
+# и версия, пропускаются целиком: без признаков, скоринга и записи в БД.
+# Новая версия модели (или порог) — пересчитываются все.
+#
+#   python rescore.py [data.json] [имя модели] [порог]
+
+MODEL = os.environ.get("ELECTRICITY_RESCORE_MODEL", "extended")
+BATCH_SIZE = 10_000
+
+
+def model_version(artifact, threshold):
+    # Порог входит в версию: от него зависит сохранённый is_commercial
+    return f"{artifact.name}/{artifact.version}@{threshold:g}"
+
+
+async def stored_hashes(account_ids):
+    rows = await ElectricityConsumer.filter(account_id__in=account_ids).values_list(
+        "account_id", "input_hash", "model_version")
+    return {account_id: (input_hash, version) for account_id, input_hash, version in rows}
+
+
+async def rescore(path, artifact, threshold=None, batch_size=BATCH_SIZE, verbose=True):
+    # Возвращает (пропущено, пересчитано)
+    threshold = artifact.threshold if threshold is None else threshold
+    version = model_version(artifact, threshold)
+    skipped = rescored = 0
+    started = time.perf_counter()
+    for batch in iter_dataset(path, batch_size):
+        hashes = input_hashes(batch)
+        if isinstance(batch, ColumnarDataset):
+            account_ids = batch.accountId.tolist()
+        else:
+            account_ids = [record["accountId"] for record in batch]
+        stored = await stored_hashes(account_ids)
+        changed = [i for i, (account_id, input_hash) in enumerate(zip(account_ids, hashes))
+                   if stored.get(account_id) != (input_hash, version)]
+        skipped += len(batch) - len(changed)
+        if changed:
+            records = [batch[i] for i in changed]
+            proba = artifact.score(records)
+            attach_predictions(records, proba, proba > threshold)
+            for record, i in zip(records, changed):
+                record["inputHash"] = hashes[i]
+                record["modelVersion"] = version
+            await insert_chunk(records)
+            rescored += len(records)
+        if verbose:
+            elapsed = time.perf_counter() - started
+            print(f"Пропущено {skipped}, пересчитано {rescored} ({(skipped + rescored) / elapsed:.0f} строк/с)")
+    return skipped, rescored
+
+
+async def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else "data.json"
+    artifact = load_artifact(sys.argv[2] if len(sys.argv) > 2 else MODEL)
+    threshold = float(sys.argv[3]) if len(sys.argv) > 3 else artifact.threshold
+    await init_db()
+    skipped, rescored = await rescore(path, artifact, threshold)
+    await Tortoise.close_connections()
+    print(f"✅ Модель {model_version(artifact, threshold)}: "
+          f"пропущено без изменений {skipped}, пересчитано {rescored}")
+
+
+if __name__ == "__main__":
+    begin_run("rescore")
+    run_async(main())
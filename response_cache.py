@@ -0,0 +1,107 @@
+import hashlib
+import time
+from collections import OrderedDict
+
+# === Кэш готовых JSON-ответов API ===
+# LRU с ограничением по числу записей и суммарному размеру, записи живут не дольше ttl.
+# Каждая запись помечена версией данных: после загрузки convert.py версия растёт,
+# и записи прежней версии считаются промахом и удаляются.
+
+
+class CacheEntry:
+    __slots__ = ("version", "expires", "body", "etag", "headers")
+
+    def __init__(self, version, expires, body, etag, headers):
+        self.version = version
+        self.expires = expires
+        self.body = body
+        self.etag = etag
+        self.headers = headers
+
+
+def make_etag(body):
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match, etag):
+    # If-None-Match может содержать несколько тегов через запятую, слабые W/"..." и *
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+class ResponseCache:
+
+    def __init__(self, max_entries=2048, max_bytes=64 * 2 ** 20, ttl=300.0):
+        # max_entries=0 — кэш выключен
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.size = 0
+        self.version = None
+        self.hits = self.misses = self.evictions = self.expired = self.invalidations = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _drop(self, key):
+        entry = self.entries.pop(key)
+        self.size -= len(entry.body)
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+    def _check_version(self, version):
+        # Новая версия данных — все записи устарели разом
+        if version != self.version:
+            if self.entries:
+                self.invalidations += 1
+            self.clear()
+            self.version = version
+
+    def get(self, key, version):
+        self._check_version(version)
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.expires <= time.monotonic():
+            self._drop(key)
+            self.expired += 1
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key, version, body, headers=None):
+        entry = CacheEntry(version, time.monotonic() + self.ttl, body, make_etag(body), headers or {})
+        self._check_version(version)
+        if not self.max_entries or len(body) > self.max_bytes:
+            return entry
+        if key in self.entries:
+            self._drop(key)
+        self.entries[key] = entry
+        self.size += len(body)
+        while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+            self._drop(next(iter(self.entries)))
+            self.evictions += 1
+        return entry
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expired": self.expired,
+            "invalidations": self.invalidations,
+            "entries": len(self.entries),
+            "bytes": self.size,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "data_version": self.version,
+        }
@@ -0,0 +1,104 @@
+import asyncio
+import time
+
+# === Микробатчинг онлайн-скоринга ===
+# Одновременные запросы /score копятся до max_wait секунд (или max_batch записей)
+# и считаются одной матрицей: признаки и три модели вызываются один раз на батч.
+# Расчёт идёт в пуле потоков, цикл событий не блокируется. Пока все потоки заняты,
+# новые запросы копятся дальше — под нагрузкой батчи растут сами.
+
+
+class MicroBatcher:
+
+    def __init__(self, fn, max_batch=512, max_wait=0.005, executor=None, max_in_flight=1):
+        # fn(records) -> последовательность результатов той же длины
+        self.fn = fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.executor = executor
+        self.max_in_flight = max_in_flight
+        self.pending = []
+        self.pending_rows = 0
+        self.in_flight = 0
+        self.timer = None
+        self.tasks = set()
+        self.requests = self.rows = self.batches = 0
+        self.busy_seconds = 0.0
+
+    async def submit(self, records):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((records, future))
+        self.pending_rows += len(records)
+        self.requests += 1
+        if self.pending_rows >= self.max_batch:
+            self._flush()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if not self.pending or self.in_flight >= self.max_in_flight:
+            return
+        # Не больше max_batch записей за раз; остаток уйдёт следующим батчем
+        batch, rows = [], 0
+        while self.pending and (not batch or rows + len(self.pending[0][0]) <= self.max_batch):
+            records, future = self.pending.pop(0)
+            batch.append((records, future))
+            rows += len(records)
+        self.pending_rows -= rows
+        self.in_flight += 1
+        task = asyncio.ensure_future(self._run(batch))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _run(self, batch):
+        loop = asyncio.get_running_loop()
+        records = [record for part, _ in batch for record in part]
+        started = time.perf_counter()
+        try:
+            results = await loop.run_in_executor(self.executor, self.fn, records)
+        except Exception as error:
+            # Ошибка одной некорректной записи не должна ронять чужие запросы батча
+            for part, future in batch:
+                try:
+                    result = error if len(batch) == 1 else await loop.run_in_executor(self.executor, self.fn, part)
+                    if not isinstance(result, Exception):
+                        self.batches += 1
+                        self.rows += len(part)
+                except Exception as part_error:
+                    result = part_error
+                if not future.done():
+                    if isinstance(result, Exception):
+                        future.set_exception(result)
+                    else:
+                        future.set_result(result)
+            return
+        finally:
+            self.busy_seconds += time.perf_counter() - started
+            self.in_flight -= 1
+            if self.pending:
+                self._flush()
+        self.batches += 1
+        self.rows += len(records)
+        offset = 0
+        for part, future in batch:
+            # Клиент мог отключиться — его future уже отменён
+            if not future.done():
+                future.set_result(results[offset:offset + len(part)])
+            offset += len(part)
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "rows": self.rows,
+            "batches": self.batches,
+            "avg_batch_rows": self.rows / self.batches if self.batches else None,
+            "busy_seconds": self.busy_seconds,
+            "pending_rows": self.pending_rows,
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+        }
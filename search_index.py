@@ -0,0 +1,102 @@
+import numpy as np
+from addresses import display_fields
+
+# === Поисковый индекс по адресам потребителей ===
+# Строится в памяти из БД: триграммы нормализованного адреса → позиции строк.
+# Строки хранятся по убыванию is_commercial_prob, поэтому первые найденные
+# совпадения — сразу лучшие, и поиск останавливается на limit.
+
+NGRAM = 3
+CHUNK = 4096
+
+
+def normalize(text):
+    return " ".join(text.lower().replace("ё", "е").split())
+
+
+def ngrams(text):
+    return {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+
+class AddressIndex:
+
+    def __init__(self, rows):
+        # rows: (account_id, address, is_commercial, building_type, rooms_count, total_area, is_commercial_prob
+        #        [, title, description, avatar]) — сохранённые поля отображения, если есть
+        rows = sorted(rows, key=lambda r: (-r[6], -r[0]))
+        self.account_id = np.array([r[0] for r in rows], dtype=np.int64)
+        self.is_commercial = np.array([bool(r[2]) for r in rows], dtype=bool)
+        self.prob = np.array([r[6] for r in rows], dtype=np.float64)
+        self.building_types = sorted({r[3] for r in rows})
+        codes = {name: code for code, name in enumerate(self.building_types)}
+        self.building_type = np.array([codes[r[3]] for r in rows], dtype=np.int32)
+        self.text = [normalize(r[1]) for r in rows]
+        self.display = [tuple(r[7:10]) if len(r) > 7 and r[7] is not None else display_fields(r[1], r[3], r[4], r[5])
+                        for r in rows]
+
+        postings = {}
+        for position, text in enumerate(self.text):
+            for gram in ngrams(text):
+                postings.setdefault(gram, []).append(position)
+        self.postings = {gram: np.array(p, dtype=np.int32) for gram, p in postings.items()}
+
+    def __len__(self):
+        return len(self.account_id)
+
+    def _filter_mask(self, is_commercial, building_type, min_prob, max_prob):
+        mask = np.ones(len(self), dtype=bool)
+        if is_commercial is not None:
+            mask &= self.is_commercial == is_commercial
+        if building_type is not None:
+            if building_type not in self.building_types:
+                return np.zeros(len(self), dtype=bool)
+            mask &= self.building_type == self.building_types.index(building_type)
+        if min_prob is not None:
+            mask &= self.prob >= min_prob
+        if max_prob is not None:
+            mask &= self.prob <= max_prob
+        return mask
+
+    def _iter_candidates(self, query, mask, chunk=CHUNK):
+        # Кандидаты порциями в порядке убывания вероятности: для частых запросов
+        # не нужно пересекать списки целиком, достаточно набрать limit совпадений
+        if len(query) < NGRAM:
+            base, others = np.flatnonzero(mask), []
+        else:
+            lists = []
+            for gram in ngrams(query):
+                if gram not in self.postings:
+                    return
+                lists.append(self.postings[gram])
+            lists.sort(key=len)
+            base, others = lists[0], lists[1:]
+        for start in range(0, len(base), chunk):
+            part = base[start:start + chunk]
+            part = part[mask[part]]
+            for other in others:
+                if not len(part):
+                    break
+                lo, hi = np.searchsorted(other, [part[0], part[-1] + 1])
+                part = part[np.isin(part, other[lo:hi], assume_unique=True)]
+            yield part
+
+    def search(self, query="", is_commercial=None, building_type=None, min_prob=None, max_prob=None, limit=20):
+        query = normalize(query)
+        mask = self._filter_mask(is_commercial, building_type, min_prob, max_prob)
+        results = []
+        for part in self._iter_candidates(query, mask):
+            for position in part.tolist():
+                # Триграммы дают кандидатов, подстрока проверяется точно
+                if query and query not in self.text[position]:
+                    continue
+                title, description, avatar = self.display[position]
+                results.append({
+                    "id": int(self.account_id[position]),
+                    "title": title,
+                    "description": description,
+                    "avatar": avatar,
+                    "prob": float(self.prob[position]),
+                })
+                if len(results) >= limit:
+                    return results
+        return results
@@ -0,0 +1,206 @@
+import numpy as np
+import pandas as pd
+from tortoise.transactions import in_transaction
+import Backend1
+from Backend1 import ConsumerSummary, DataVersion, ElectricityConsumer, MonthlyConsumption, unpack_consumption
+
+# === Агрегаты для /stats ===
+# Вклад потребителей в группы (весь набор, регион, район, тип здания, корзина вероятности)
+# считается векторно через groupby. Агрегаты аддитивны, поэтому convert.py обновляет
+# их по чанку: вклад новых версий строк минус вклад прежних, в той же транзакции.
+# Все, кто меняет ConsumerSummary, первым делом блокируют строку DataVersion
+# (lock_summary): параллельные загрузки и пересчёт идут по очереди, снимок
+# "до" и вклад в агрегаты считаются под одной блокировкой, а новые группы не
+# создаются дважды. Блокировка строк самой ConsumerSummary этого не даёт: групп,
+# которых ещё нет, она не покрывает; F()-инкременты не подходят — month_sum в JSON.
+
+PROB_BUCKETS = 20
+DIMENSIONS = ("total", "region", "district", "building_type", "prob_bucket")
+SUMMARY_FIELDS = ("account_id", "region", "district", "building_type",
+                  "is_commercial", "is_commercial_prob", "total_area")
+MONTH_SUMS = [f"sum_{m}" for m in range(1, 13)]
+MONTH_COUNTS = [f"n_{m}" for m in range(1, 13)]
+SUM_COLUMNS = ["count", "commercial", "prob_sum", "area_sum", "area_count", *MONTH_SUMS, *MONTH_COUNTS]
+REBUILD_CHUNK = 20_000
+
+
+def summarize(records):
+    # records: словари с полями SUMMARY_FIELDS и consumption {"1": значение, ...}
+    if not records:
+        return pd.DataFrame(columns=SUM_COLUMNS, index=pd.MultiIndex.from_tuples([], names=["dimension", "group_key"]))
+    frame = pd.DataFrame.from_records(records, columns=[*SUMMARY_FIELDS, "consumption"])
+    n = len(frame)
+    months = np.full((n, 12), np.nan)
+    for i, consumption in enumerate(frame["consumption"]):
+        for month, value in consumption.items():
+            months[i, int(month) - 1] = value
+    prob = frame["is_commercial_prob"].to_numpy(dtype=np.float64)
+    area = frame["total_area"].to_numpy(dtype=np.float64, na_value=np.nan)
+
+    values = pd.DataFrame({
+        "count": np.ones(n, dtype=np.int64),
+        "commercial": frame["is_commercial"].astype(bool).to_numpy(dtype=np.int64),
+        "prob_sum": prob,
+        "area_sum": np.nan_to_num(area),
+        "area_count": (~np.isnan(area)).astype(np.int64),
+    })
+    values[MONTH_SUMS] = np.nan_to_num(months)
+    values[MONTH_COUNTS] = (~np.isnan(months)).astype(np.int64)
+
+    bucket = np.clip((prob * PROB_BUCKETS).astype(np.int64), 0, PROB_BUCKETS - 1)
+    keys = {
+        "total": np.full(n, ""),
+        "region": frame["region"].fillna("").to_numpy(),
+        "district": frame["district"].fillna("").to_numpy(),
+        "building_type": frame["building_type"].fillna("").to_numpy(),
+        "prob_bucket": bucket.astype(str),
+    }
+    parts = []
+    for dimension in DIMENSIONS:
+        grouped = values.groupby(keys[dimension]).sum()
+        grouped.index = pd.MultiIndex.from_arrays([np.full(len(grouped), dimension), grouped.index],
+                                                  names=["dimension", "group_key"])
+        parts.append(grouped)
+    return pd.concat(parts)
+
+
+async def stored_records(query, using_db=None):
+    # Записи для summarize() из БД: потребление — из строки или из MonthlyConsumption
+    if using_db is not None:
+        query = query.using_db(using_db)
+    if Backend1.CONSUMPTION_STORAGE == "packed":
+        rows = await query.values(*SUMMARY_FIELDS, "consumption_packed")
+        for row in rows:
+            row["consumption"] = unpack_consumption(row.pop("consumption_packed"))
+        return rows
+    rows = await query.values(*SUMMARY_FIELDS)
+    by_account = {row["account_id"]: row for row in rows}
+    for row in rows:
+        row["consumption"] = {}
+    months = MonthlyConsumption.filter(account_id__in=list(by_account))
+    if using_db is not None:
+        months = months.using_db(using_db)
+    for account_id, month, value in await months.values_list("account_id", "month", "value"):
+        by_account[account_id]["consumption"][str(month)] = value
+    return rows
+
+
+def _row_values(row):
+    return [row.count, row.commercial, row.prob_sum, row.area_sum, row.area_count,
+            *(row.month_sum or [0.0] * 12), *(row.month_count or [0] * 12)]
+
+
+def _set_row_values(row, values):
+    row.count, row.commercial = int(values[0]), int(values[1])
+    row.prob_sum, row.area_sum, row.area_count = float(values[2]), float(values[3]), int(values[4])
+    row.month_sum = [float(v) for v in values[5:17]]
+    row.month_count = [int(v) for v in values[17:29]]
+
+
+async def lock_summary(using_db):
+    # Строка версии создаётся при первой загрузке; INSERT без конфликта, затем FOR UPDATE
+    # (в SQLite сама запись INSERT уже берёт блокировку на запись до конца транзакции)
+    await DataVersion.bulk_create([DataVersion(id=1, version=0)], ignore_conflicts=True, using_db=using_db)
+    await DataVersion.filter(id=1).select_for_update().using_db(using_db)
+
+
+async def apply_summary_delta(delta, using_db=None):
+    # delta — разность summarize(); строки ConsumerSummary создаются по мере надобности
+    if delta.empty:
+        return
+    if using_db is None:
+        async with in_transaction() as connection:
+            return await apply_summary_delta(delta, connection)
+    await lock_summary(using_db)
+    query = ConsumerSummary.all().using_db(using_db)
+    existing = {(row.dimension, row.group_key): row for row in await query}
+    created, updated = [], []
+    for key, values in zip(delta.index, delta[SUM_COLUMNS].to_numpy(dtype=np.float64)):
+        row = existing.get(key)
+        if row is None:
+            row = ConsumerSummary(dimension=key[0], group_key=key[1])
+            _set_row_values(row, values)
+            created.append(row)
+        else:
+            _set_row_values(row, np.asarray(_row_values(row), dtype=np.float64) + values)
+            updated.append(row)
+    if created:
+        await ConsumerSummary.bulk_create(created, using_db=using_db)
+    if updated:
+        await ConsumerSummary.bulk_update(updated, fields=["count", "commercial", "prob_sum", "area_sum",
+                                                           "area_count", "month_sum", "month_count"],
+                                          using_db=using_db)
+
+
+def summary_delta(new_records, old_records):
+    new, old = summarize(new_records), summarize(old_records)
+    return new.sub(old, fill_value=0) if len(old) else new
+
+
+async def rebuild_summary(chunk_size=REBUILD_CHUNK, using_db=None):
+    # Полный пересчёт по всей таблице потребителей (migrate.py, построчный загрузчик).
+    # Одна транзакция: /stats не видит пустую таблицу агрегатов, а загрузки
+    # во время пересчёта ждут lock_summary
+    if using_db is None:
+        async with in_transaction() as connection:
+            return await rebuild_summary(chunk_size, connection)
+    await lock_summary(using_db)
+    total = None
+    last = None
+    while True:
+        query = ElectricityConsumer.all().order_by("account_id").limit(chunk_size)
+        if last is not None:
+            query = query.filter(account_id__gt=last)
+        records = await stored_records(query, using_db)
+        if not records:
+            break
+        last = records[-1]["account_id"]
+        part = summarize(records)
+        total = part if total is None else total.add(part, fill_value=0)
+    await ConsumerSummary.all().using_db(using_db).delete()
+    if total is not None:
+        await apply_summary_delta(total, using_db)
+
+
+def _group(row):
+    month_sum, month_count = row["month_sum"] or [0.0] * 12, row["month_count"] or [0] * 12
+    count = row["count"]
+    return {
+        "key": row["group_key"] or None,
+        "count": count,
+        "commercial": row["commercial"],
+        "commercial_share": row["commercial"] / count,
+        "avg_prob": row["prob_sum"] / count,
+        "avg_area": row["area_sum"] / row["area_count"] if row["area_count"] else None,
+        "monthly": [s / c if c else None for s, c in zip(month_sum, month_count)],
+    }
+
+
+def stats_response(rows):
+    # rows — ConsumerSummary.values(); пустые группы (все потребители ушли) пропускаются
+    groups = {dimension: [] for dimension in DIMENSIONS}
+    buckets = np.zeros((PROB_BUCKETS, 2), dtype=np.int64)
+    for row in rows:
+        if row["count"] <= 0:
+            continue
+        if row["dimension"] == "prob_bucket":
+            buckets[int(row["group_key"])] = row["count"], row["commercial"]
+        elif row["dimension"] in groups:
+            groups[row["dimension"]].append(_group(row))
+    for items in groups.values():
+        items.sort(key=lambda item: (-item["count"], item["key"] or ""))
+    total = groups["total"][0] if groups["total"] else {
+        "key": None, "count": 0, "commercial": 0, "commercial_share": None,
+        "avg_prob": None, "avg_area": None, "monthly": [None] * 12,
+    }
+    del total["key"]
+    return {
+        "total": total,
+        "by_region": groups["region"],
+        "by_district": groups["district"],
+        "by_building_type": groups["building_type"],
+        "probability_histogram": [
+            {"from": i / PROB_BUCKETS, "to": (i + 1) / PROB_BUCKETS, "count": int(count), "commercial": int(commercial)}
+            for i, (count, commercial) in enumerate(buckets.tolist())
+        ],
+    }
@@ -0,0 +1,151 @@
+import sys
+import numpy as np
+from jsonstream import JsonWriter
+
+# === Синтетические потребители в схеме dataset_train.json ===
+# Пропорции взяты с реального набора: ~39% коммерческих, ~42% без totalArea,
+# ~22% записей без части месяцев, в основном «Частный». Адреса — в стиле
+# Краснодарского края (район, тип и название населённого пункта, улица, дом,
+# у многоквартирных — квартира); как и в реальных данных, ~2% зданий с несколькими счетами.
+# Профиль потребления сезонный: у бытовых — зимний пик (отопление),
+# у коммерческих — летний (курортный сезон), с логнормальным масштабом.
+#
+#   python synthetic.py 1000000 synthetic_1m.json
+
+BUILDING_TYPES = ["Частный", "Прочий", "Многоквартирный", "Гараж", "Дача", "Сарай"]
+BUILDING_WEIGHTS = [0.877, 0.094, 0.024, 0.003, 0.0015, 0.0005]
+COMMERCIAL_SHARE = 0.39
+NO_AREA_SHARE = 0.42
+PARTIAL_MONTHS_SHARE = 0.22
+
+REGIONS = ["Краснодарский край"] * 9 + ["Республика Адыгея"]
+DISTRICTS = [
+    "Мостовский", "Усть-Лабинский", "Анапский", "Калининский", "Тихорецкий", "Новокубанский",
+    "Ейский", "Щербиновский", "Северский", "Абинский", "Крымский", "Динской", "Кореновский",
+    "Славянский", "Темрюкский", "Туапсинский", "Белореченский", "Апшеронский",
+]
+CITIES = ["г Краснодар", "г Сочи", "г Новороссийск", "г Армавир", "г Майкоп", "г Геленджик"]
+SETTLEMENT_TYPES = ["ст-ца", "х", "п", "с", "пгт", "село"]
+SETTLEMENT_NAMES = [
+    "Андреевская", "Братский", "Витязево", "Архангельская", "Южный", "Воронцовка",
+    "Новощербиновская", "Раздольное", "Саратовская", "Пригибский", "Мостовской", "Ахтырский",
+    "Ильский", "Холмская", "Полтавская", "Петровская", "Лазаревское", "Волковка", "Черешня",
+]
+STREET_TYPES = ["ул"] * 8 + ["пер"] * 2 + ["пр-кт", "проезд"]
+STREETS = [
+    "Ленина", "Колхозная", "Матросова", "Калинина", "Солнечная", "Одесская", "Затонная",
+    "Партизанская", "Школьный", "Дружная", "Центральная", "Набережная", "Красная", "Мира",
+    "Советская", "Гагарина", "Садовая", "Шевченко", "Победы", "Московская", "Кирова",
+    "Пушкина", "Октябрьская", "Степная", "Лесная", "Заречная", "Северная", "Южная",
+]
+HOUSE_SUFFIXES = [""] * 12 + ["А", "Б", "В", "1", "2"]
+
+# Относительная сезонность по месяцам 1..12 (по медианам реального набора)
+PRIVATE_PROFILE = np.array([1.30, 1.20, 1.12, 0.95, 0.98, 0.85, 0.95, 0.95, 0.80, 0.75, 1.02, 1.10])
+COMMERCIAL_PROFILE = np.array([0.85, 0.80, 0.78, 0.76, 0.75, 1.00, 1.35, 1.60, 1.25, 0.80, 0.72, 0.65])
+
+
+def _pick(rng, values, n, weights=None):
+    index = rng.choice(len(values), size=n, p=weights)
+    return [values[i] for i in index.tolist()]
+
+
+def _component(building, salt, size):
+    # Детерминированная «случайная» часть адреса по номеру здания: одно здание —
+    # один и тот же адрес в любом батче
+    mixed = (building * 0x9E3779B1 + salt * 0x85EBCA77) & 0xFFFFFFFF
+    mixed ^= mixed >> 15
+    return (mixed % size).tolist()
+
+
+def _addresses(rng, n, building_types, buildings):
+    building = rng.integers(0, buildings, size=n).astype(np.uint64)
+    region = _component(building, 1, len(REGIONS))
+    kind = _component(building, 2, 10)
+    district = _component(building, 3, len(DISTRICTS))
+    city = _component(building, 4, len(CITIES))
+    settlement_type = _component(building, 5, len(SETTLEMENT_TYPES))
+    settlement = _component(building, 6, len(SETTLEMENT_NAMES))
+    street_type = _component(building, 7, len(STREET_TYPES))
+    street = _component(building, 8, len(STREETS))
+    number = _component(building, 9, 199)
+    suffix = _component(building, 10, len(HOUSE_SUFFIXES))
+    flats = rng.integers(1, 120, size=n).tolist()
+    addresses = []
+    for i in range(n):
+        settlement_name = f"{SETTLEMENT_TYPES[settlement_type[i]]} {SETTLEMENT_NAMES[settlement[i]]}"
+        if REGIONS[region[i]] == "Республика Адыгея":
+            place = f"г Майкоп, {settlement_name}"
+        elif kind[i] < 3:
+            place = CITIES[city[i]]
+        else:
+            place = f"р-н {DISTRICTS[district[i]]}, {settlement_name}"
+        address = (f"{REGIONS[region[i]]}, {place}, {STREET_TYPES[street_type[i]]} {STREETS[street[i]]}, "
+                   f"д. {number[i] + 1} {HOUSE_SUFFIXES[suffix[i]]}")
+        if building_types[i] == "Многоквартирный":
+            address += f", кв. {flats[i]}"
+        addresses.append(address)
+    return addresses
+
+
+def make_realistic_consumers(n, seed=0, start_id=1, buildings=None):
+    # buildings — размер пула зданий; при 20 зданиях на счёт повторы адресов
+    # встречаются примерно с той же частотой, что в dataset_train.json
+    rng = np.random.default_rng(seed)
+    commercial = rng.random(n) < COMMERCIAL_SHARE
+    building_types = _pick(rng, BUILDING_TYPES, n, BUILDING_WEIGHTS)
+    addresses = _addresses(rng, n, building_types, buildings or 20 * n)
+
+    rooms = np.clip(rng.poisson(2.6, size=n), 1, 12)
+    residents = np.clip(rng.poisson(2.3, size=n) + 1, 1, 12)
+    has_rooms = rng.random(n) > 0.10
+    has_residents = rng.random(n) > 0.14
+    area = np.round(rng.lognormal(np.log(65), 0.5, size=n) * (1 + commercial), 1)
+    has_area = rng.random(n) > NO_AREA_SHARE
+
+    # Масштаб потребления логнормальный (тяжёлый хвост), шум по месяцам мультипликативный
+    scale = rng.lognormal(np.log(1500), 0.9, size=n) * np.where(commercial, 1.4, 1.0)
+    profile = np.where(commercial[:, None], COMMERCIAL_PROFILE, PRIVATE_PROFILE)
+    months = np.round(scale[:, None] * profile * rng.lognormal(0, 0.25, size=(n, 12))).astype(np.int64)
+    months[rng.random((n, 12)) < 0.02] = 0
+    # У части счетов первые месяцы отсутствуют (открыты в середине года)
+    first = np.where(rng.random(n) < PARTIAL_MONTHS_SHARE, rng.integers(1, 8, size=n), 0)
+
+    data = []
+    for i in range(n):
+        entry = {
+            "accountId": start_id + i,
+            "isCommercial": bool(commercial[i]),
+            "address": addresses[i],
+            "buildingType": building_types[i],
+        }
+        if has_rooms[i]:
+            entry["roomsCount"] = int(rooms[i])
+        if has_residents[i]:
+            entry["residentsCount"] = int(residents[i])
+        values = months[i].tolist()
+        entry["consumption"] = {str(m + 1): values[m] for m in range(first[i], 12)}
+        if has_area[i]:
+            entry["totalArea"] = float(area[i])
+        data.append(entry)
+    return data
+
+
+def iter_realistic(n, batch_size=50_000, seed=0):
+    # Батчами: 10M записей генерируются без удержания всего набора в памяти
+    for batch_index, start in enumerate(range(0, n, batch_size)):
+        yield make_realistic_consumers(min(batch_size, n - start), seed * 1_000_003 + batch_index, start + 1,
+                                       buildings=20 * n)
+
+
+def write_realistic(path, n, batch_size=50_000, seed=0, indent=None):
+    # По умолчанию компактно, как dataset_train.json
+    with JsonWriter(path, indent=indent, separators=None if indent else (",", ":")) as writer:
+        for batch in iter_realistic(n, batch_size, seed):
+            writer.write_many(batch)
+    return writer.count
+
+
+if __name__ == "__main__":
+    count = write_realistic(sys.argv[2], int(sys.argv[1]))
+    print(f"Записано {count} потребителей в {sys.argv[2]}")
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+from metrics import stage
+
+# === Подбор порога классификации ===
+# Вероятности сортируются один раз, после чего матрицы ошибок для всех порогов
+# получаются из накопленных сумм: prediction = proba > threshold, как в скриптах.
+
+DEFAULT_THRESHOLDS = np.linspace(0.3, 0.7, 41)
+
+
+def _ratio(num, den):
+    # 0 при нулевом знаменателе, как zero_division по умолчанию в sklearn
+    out = np.zeros(len(num), dtype=np.float64)
+    np.divide(num, den, out=out, where=den > 0)
+    return out
+
+
+@stage("threshold search")
+def threshold_curve(y_true, proba, thresholds=DEFAULT_THRESHOLDS):
+    # thresholds=None — каждое различное значение вероятности
+    y_true = np.asarray(y_true).astype(bool)
+    proba = np.asarray(proba, dtype=np.float64)
+    order = np.argsort(proba, kind="stable")
+    sorted_proba = proba[order]
+    positives_below = np.concatenate([[0], np.cumsum(y_true[order])])
+    if thresholds is None:
+        thresholds = np.unique(sorted_proba)
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+
+    # Число объектов с proba <= t и сколько среди них положительных
+    below = np.searchsorted(sorted_proba, thresholds, side="right")
+    fn = positives_below[below]
+    tn = below - fn
+    tp = positives_below[-1] - fn
+    fp = len(proba) - below - tp
+
+    recall_true = _ratio(tp, tp + fn)
+    recall_false = _ratio(tn, tn + fp)
+    return pd.DataFrame({
+        "threshold": thresholds,
+        "tp": tp, "fp": fp, "tn": tn, "fn": fn,
+        "recall_false": recall_false,
+        "recall_true": recall_true,
+        "balanced_accuracy": (recall_false + recall_true) / 2,
+        "f1_true": _ratio(2 * tp, 2 * tp + fp + fn),
+        "f1_false": _ratio(2 * tn, 2 * tn + fn + fp),
+    })
+
+
+def best_threshold(y_true, proba, thresholds=DEFAULT_THRESHOLDS, metric="balanced_accuracy"):
+    curve = threshold_curve(y_true, proba, thresholds)
+    return curve.loc[curve[metric].idxmax()]